@@ -28,7 +28,12 @@ def handler(event, context):
         from pipeline import ETLPipeline
 
         pipeline = ETLPipeline()
-        pipeline.run()
+        try:
+            pipeline.run()
+        finally:
+            # Warm containers reuse the process: don't leave the HTTP
+            # session and DB connection open between invocations.
+            pipeline.close()
 
         return {
             'statusCode': 200,
@@ -10,7 +10,14 @@ def setup_logging():
     Configure logging.
     Lambda's filesystem is read-only except for /tmp,
     so we write logs there when running in Lambda.
+
+    Idempotent: once the root logger has handlers (warm Lambda container,
+    repeated ETLPipeline() in tests) it returns straight away instead of
+    building another FileHandler that basicConfig would ignore anyway.
     """
+    if logging.getLogger().handlers:
+        return logging.getLogger(__name__)
+
     # AWS_LAMBDA_FUNCTION_NAME is auto-injected by the Lambda runtime.
     # Locally and on GitHub Actions it doesn't exist.
     if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
@@ -1,8 +1,11 @@
 # src/ingestion/api_client.py
 
+import logging
 import requests
-import json
-import time
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import orjson
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 import os
@@ -12,6 +15,29 @@ from botocore.exceptions import ClientError
 
 load_dotenv()
 
+# urllib3 logs every pooled connection / retry at DEBUG/INFO; keep it quiet.
+logging.getLogger('urllib3').setLevel(logging.WARNING)
+
+
+class CappedRetry(Retry):
+    """
+    urllib3 Retry that honours Retry-After, but never sleeps longer than
+    max_retry_after seconds per attempt.
+
+    Plain Retry sleeps for whatever the gateway asks for; a 429 with
+    Retry-After: 3600 would hold a Lambda invocation until its timeout.
+    urllib3 rebuilds the object on every attempt via type(self)(...), so
+    the subclass (and the class-level cap) carries through all retries.
+    """
+
+    max_retry_after = 10
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        if retry_after is None:
+            return None
+        return min(retry_after, self.max_retry_after)
+
 
 class NSAPIClient:
     """
@@ -19,7 +45,9 @@ class NSAPIClient:
     Raw JSON is archived locally and to AWS S3.
     """
 
-    def __init__(self):
+    def __init__(self, max_retries=3, logger=None):
+        self.logger = logger or logging.getLogger(__name__)
+
         # --- NS API ---
         self.api_key = os.getenv('NS_API_KEY')
         if not self.api_key:
@@ -28,6 +56,28 @@ class NSAPIClient:
         self.base_url = "https://gateway.apiportal.ns.nl/reisinformatie-api/api/v3"
         self.headers = {'Ocp-Apim-Subscription-Key': self.api_key}
 
+        # One Session for the client's lifetime: retries and repeat calls reuse
+        # the pooled keep-alive connection instead of a fresh TCP + TLS handshake.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+
+        # Retries live in the adapter: timeouts, connection errors and
+        # 429/5xx responses are retried with exponential backoff (0s, 2s, 4s),
+        # and a Retry-After header from the gateway takes precedence, capped
+        # at CappedRetry.max_retry_after seconds per attempt.
+        # raise_on_status=False hands the final error response back so
+        # raise_for_status() can still report 401/429 explicitly.
+        retries = CappedRetry(
+            total=max_retries,
+            backoff_factor=1.0,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=4, max_retries=retries)
+        self.session.mount('https://', adapter)
+
         # --- AWS S3 ---
         # boto3 automatically reads AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY,
         # and AWS_DEFAULT_REGION from environment variables (loaded via dotenv).
@@ -40,54 +90,61 @@ class NSAPIClient:
             self.s3_client = boto3.client('s3')
             # Lightweight check: verify the bucket is accessible
             self.s3_client.head_bucket(Bucket=self.s3_bucket)
-            print(f"  S3 connected: s3://{self.s3_bucket}")
+            self.logger.info("  S3 connected: s3://%s", self.s3_bucket)
         except ClientError as e:
             # head_bucket raises ClientError if bucket not found or no access
-            print(f"  S3 unavailable ({e}), will save locally only.")
+            self.logger.warning("  S3 unavailable (%s), will save locally only.", e)
             self.s3_client = None
         except Exception as e:
-            print(f"  S3 init failed ({e}), will save locally only.")
+            self.logger.warning("  S3 init failed (%s), will save locally only.", e)
             self.s3_client = None
 
-    def fetch_disruptions(self, max_retries=3):
+    def fetch_disruptions(self):
         """
-        Download disruption data with retry / exponential backoff.
+        Download disruption data.
+        Retry / exponential backoff is handled by the session adapter (see __init__).
+
+        Returns (data, records): the parsed records plus each one encoded
+        exactly once as compact orjson bytes, in the same order. That
+        encoding is the canonical raw form — the archive, the Athena copy
+        and the raw_disruptions.raw_json column are all built from it, so
+        they stay byte-identical and stable for hashing / dedup downstream.
+        Both are empty lists on failure.
         """
         url = f"{self.base_url}/disruptions"
 
-        for attempt in range(1, max_retries + 1):
-            try:
-                print(f"Attempt {attempt}/{max_retries}...")
-                response = requests.get(url, headers=self.headers, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                print(" Fetch successful.")
-                self._save_raw_data(data)
-                return data
-
-            except requests.exceptions.Timeout:
-                print("  Request timed out.")
-                if attempt < max_retries:
-                    wait_time = 2 ** attempt      # 2s, 4s, 8s
-                    print(f"   Retrying in {wait_time}s...")
-                    time.sleep(wait_time)
-                else:
-                    print(" Max retries reached.")
-                    return []
-
-            except requests.exceptions.HTTPError as e:
-                print(f" HTTP error: {e}")
-                if e.response.status_code == 401:
-                    print("     Invalid API key — check NS_API_KEY in .env")
-                elif e.response.status_code == 429:
-                    print("     Rate limited — try again later.")
-                return []
-
-            except Exception as e:
-                print(f" Unexpected error: {type(e).__name__} — {e}")
-                return []
-
-    def _save_raw_data(self, data):
+        try:
+            response = self.session.get(url, timeout=10)
+            response.raise_for_status()
+            # orjson parses the raw bytes directly. Avoid response.json() /
+            # response.text here: they decode to str first and, when the
+            # gateway omits a charset, run charset_normalizer over the whole
+            # body. content is already gunzipped by urllib3, so stream=True /
+            # response.raw would only move that decoding into our code.
+            data = orjson.loads(response.content)
+            self.logger.info(" Fetch successful.")
+            records = [orjson.dumps(record) for record in data] if isinstance(data, list) else []
+            self._save_raw_data(data, records)
+            return data, records
+
+        except requests.exceptions.HTTPError as e:
+            self.logger.error(" HTTP error: %s", e)
+            if e.response.status_code == 401:
+                self.logger.error("     Invalid API key — check NS_API_KEY in .env")
+            elif e.response.status_code == 429:
+                self.logger.error("     Rate limited — try again later.")
+            return [], []
+
+        except requests.exceptions.RequestException as e:
+            # Timeouts and connection errors land here once retries are exhausted
+            self.logger.error(" Request failed after retries: %s — %s", type(e).__name__, e)
+            return [], []
+
+        except Exception as e:
+            self.logger.error(" Unexpected error: %s — %s", type(e).__name__, e)
+            return [], []
+
+    def _save_raw_data(self, data, records):
         """
         Persist raw JSON in two places:
           1. Local filesystem  → data/raw/<timestamp>.json
@@ -95,67 +152,109 @@ class NSAPIClient:
 
         The S3 key structure (year/month/day/) mirrors what we had on
         Azure Blob Storage, so the hierarchical layout stays identical.
+
+        records are the canonical per-record encodings from fetch_disruptions.
+        The archive array and the Athena JSONL copy are both stitched together
+        from those same bytes, so nothing is serialised twice. Pretty-printing
+        roughly doubled the size of every archive file and upload; pipe
+        through `jq .` to read one.
+
+        The sinks are independent I/O (disk write, S3 PUTs) that release the
+        GIL, so they run concurrently: wall-clock is the slowest sink rather
+        than the sum of all of them.
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # One clock read per save: the filename, S3 prefix and Athena copy
+        # all share the same timestamp.
+        now = datetime.now()
+        timestamp = now.strftime("%Y%m%d_%H%M%S")
         filename = f"disruptions_{timestamp}.json"
-        json_content = json.dumps(data, indent=2, ensure_ascii=False)
-
-        # 1. Local save — skip when running on Lambda (/tmp is the only writable path,
-        #    and we already have everything in S3)
-        if not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
-            filepath = Path("data/raw") / filename
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(json_content)
-            print(f" Local:  {filepath}")
-
-        # 2. S3 upload
-        # Key format:  2026/06/22/disruptions_20260622_060000.json
-        # This is the S3 equivalent of Azure Blob's hierarchical path.
-        # put_object() is the simplest upload method for strings/bytes.
-        # For large files (>100 MB) you'd use upload_file() with multipart,
-        # but JSON payloads here are well under 1 MB.
-        if self.s3_client:
-            s3_key = f"{datetime.now().strftime('%Y/%m/%d')}/{filename}"
-            try:
-                self.s3_client.put_object(
-                    Bucket=self.s3_bucket,
-                    Key=s3_key,
-                    Body=json_content.encode('utf-8'),   # S3 expects bytes
-                    ContentType='application/json'
-                )
-                print(f"  S3:     s3://{self.s3_bucket}/{s3_key}")
-            except ClientError as e:
-                # Don't crash the pipeline if cloud upload fails —
-                # same defensive pattern as the Azure version.
-                print(f"  S3 upload failed (continuing): {e}")
-
-            self._save_jsonl_for_athena(data)
-
-    def _save_jsonl_for_athena(self, data):
+        # orjson returns compact UTF-8 bytes, ready for both the file and S3.
+        # b'[' + b','.join(...) + b']' is byte-identical to orjson.dumps(data).
+        if isinstance(data, list):
+            payload = b'[' + b','.join(records) + b']'
+        else:
+            payload = orjson.dumps(data)
+
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = []
+
+            # 1. Local save — skip when running on Lambda (/tmp is the only writable path,
+            #    and we already have everything in S3)
+            if not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+                futures.append(pool.submit(self._write_local, Path("data/raw") / filename, payload))
+
+            # 2. S3 upload (archive + Athena copy)
+            if self.s3_client:
+                s3_key = f"{now.strftime('%Y/%m/%d')}/{filename}"
+                futures.append(pool.submit(self._upload_s3, s3_key, payload))
+                futures.append(pool.submit(self._save_jsonl_for_athena, records, now))
+
+            # S3 failures are logged inside the helpers; anything re-raised
+            # here is unexpected and should fail the fetch as before.
+            for future in as_completed(futures):
+                future.result()
+
+    def _write_local(self, filepath, payload):
+        """
+        Write the pre-encoded archive in a single f.write() call.
+        Don't switch this to json.dump(data, f): that streams thousands of
+        small chunks through the file object, one per token.
+        """
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(payload)
+        self.logger.info(" Local:  %s", filepath)
+
+    def _upload_s3(self, s3_key, payload):
+        """
+        Key format:  2026/06/22/disruptions_20260622_060000.json
+        This is the S3 equivalent of Azure Blob's hierarchical path.
+
+        put_object() is the simplest upload method for strings/bytes.
+        For large files (>100 MB) you'd use upload_file() with multipart
+        and a TransferConfig(max_concurrency=...), but JSON payloads here
+        are well under 1 MB — a single PUT, nothing to parallelise.
+        The pre-encoded bytes are passed with an explicit ContentLength,
+        so botocore doesn't have to probe the body for its size.
+        """
+        try:
+            self.s3_client.put_object(
+                Bucket=self.s3_bucket,
+                Key=s3_key,
+                Body=payload,                        # S3 expects bytes
+                ContentLength=len(payload),
+                ContentType='application/json'
+            )
+            self.logger.info("  S3:     s3://%s/%s", self.s3_bucket, s3_key)
+        except ClientError as e:
+            # Don't crash the pipeline if cloud upload fails —
+            # same defensive pattern as the Azure version.
+            self.logger.warning("  S3 upload failed (continuing): %s", e)
+
+    def _save_jsonl_for_athena(self, records, now):
         """
         Write one JSON record per line (JSONL) to the athena/ S3 prefix.
 
         Athena's JSON SerDe expects each line to be a complete JSON object.
-        Our raw archive uses pretty-printed arrays — fine for archival,
+        Our raw archive is a single JSON array — fine for archival,
         but unreadable by Athena. This method writes a separate query-optimised
         copy without touching the raw archive.
 
         Path: athena/YYYY/MM/DD/disruptions_<timestamp>.jsonl
         These path segments become Hive-style partition columns in the Glue table,
         letting Athena skip entire day-partitions when querying a date range.
+
+        records are the already-encoded JSON objects from fetch_disruptions.
         """
         if not self.s3_client:
             return
-        if not isinstance(data, list) or not data:
+        if not records:
             return
 
-        now = datetime.now()
         timestamp = now.strftime("%Y%m%d_%H%M%S")
 
         # One compact JSON object per line — no pretty-printing
-        jsonl_lines = [json.dumps(record, ensure_ascii=False) for record in data]
-        jsonl_content = '\n'.join(jsonl_lines)
+        jsonl_content = b'\n'.join(records)
 
         s3_key = f"athena/{now.strftime('%Y/%m/%d')}/disruptions_{timestamp}.jsonl"
 
@@ -163,20 +262,31 @@ class NSAPIClient:
             self.s3_client.put_object(
                 Bucket=self.s3_bucket,
                 Key=s3_key,
-                Body=jsonl_content.encode('utf-8'),
+                Body=jsonl_content,
+                ContentLength=len(jsonl_content),
                 ContentType='application/x-ndjson'
             )
-            print(f"  Athena: s3://{self.s3_bucket}/{s3_key}")
+            self.logger.info("  Athena: s3://%s/%s", self.s3_bucket, s3_key)
         except ClientError as e:
-            print(f"  Athena JSONL upload failed (continuing): {e}")
+            self.logger.warning("  Athena JSONL upload failed (continuing): %s", e)
+
+    def close(self):
+        """Release the pooled HTTP connections."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
 
 
 # ===== Quick smoke test =====
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     print("=== NSAPIClient smoke test ===\n")
-    client = NSAPIClient()
-    disruptions = client.fetch_disruptions()
+    with NSAPIClient() as client:
+        disruptions, _ = client.fetch_disruptions()
     if disruptions:
         print(f"\n First 3 disruptions:")
         for i, item in enumerate(disruptions[:3], 1):
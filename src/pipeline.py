@@ -1,7 +1,6 @@
 # src/pipeline.py
 
 import sys
-import json
 from pathlib import Path
 from datetime import datetime
 import pandas as pd
@@ -10,8 +9,28 @@ import os
 from ingestion.api_client import NSAPIClient
 from storage.database import Database
 from transformation.cleaners import DisruptionCleaner
+from transformation.aggregators import REFRESH_DAILY_COUNTS, REFRESH_STATION_IMPACT
 from config import setup_logging
 
+# Column order of the disruptions upsert — shared by the INSERT column list
+# and the row tuples, so the two can never drift apart.
+INSERT_COLS = [
+    'disruption_id', 'type', 'title', 'description',
+    'start_time', 'end_time', 'duration_minutes',
+    'impact_level', 'affected_stations',
+    'is_resolved', 'created_at', 'updated_at',
+    'start_jd', 'end_jd'
+]
+
+# Columns refreshed when a disruption_id already exists;
+# is_resolved and created_at keep their stored values.
+UPDATE_COLS = [
+    'type', 'title', 'description',
+    'start_time', 'end_time', 'duration_minutes',
+    'impact_level', 'affected_stations', 'updated_at',
+    'start_jd', 'end_jd'
+]
+
 
 class ETLPipeline:
     """
@@ -39,12 +58,68 @@ class ETLPipeline:
         try:
             self.api_client = NSAPIClient()
             self.database   = Database()
+            self.database.apply_perf_pragmas()
+            self.database.ensure_schema()
+            if {('disruptions', 'start_jd'), ('disruptions', 'end_jd')} & self.database.added_columns:
+                self._backfill_julian_days()
             self.cleaner    = DisruptionCleaner()
+            if 'disruption_stations' in self.database.created_tables:
+                self._backfill_station_links()
             self.logger.info(" All components initialised.")
         except Exception as e:
             self.logger.error(f" Initialisation failed: {e}")
             raise
 
+    def _backfill_julian_days(self):
+        """
+        Fill start_jd / end_jd for rows loaded before those columns existed.
+
+        New rows get them from the cleaner; this one-off UPDATE derives them
+        from the stored timestamps in SQL (julianday() on SQLite, the Unix
+        epoch offset on PostgreSQL). Only called on the run where
+        ensure_schema() added the columns, so regular runs don't pay a
+        full-table UPDATE. Failure only costs the overlap query those old rows.
+        """
+        if self.database.mode == 'postgres':
+            jd = "EXTRACT(EPOCH FROM {}) / 86400.0 + 2440587.5"
+        else:
+            jd = "julianday({})"
+
+        try:
+            self.database.cursor.execute(f"""
+                UPDATE disruptions
+                SET start_jd = {jd.format('start_time')},
+                    end_jd   = {jd.format('end_time')}
+                WHERE (start_jd IS NULL AND start_time IS NOT NULL)
+                   OR (end_jd IS NULL AND end_time IS NOT NULL)
+            """)
+            self.database.conn.commit()
+        except Exception as e:
+            self.database.conn.rollback()
+            self.logger.warning(f" Julian day backfill failed: {e}")
+
+    def _backfill_station_links(self):
+        """
+        Build disruption_stations for disruptions loaded before it existed.
+
+        Only called on the run where ensure_schema() created the table; later
+        runs keep it current through _save_station_links(). Failure only
+        costs the station queries those old disruptions.
+        """
+        try:
+            self.database.cursor.execute(
+                "SELECT disruption_id, affected_stations FROM disruptions "
+                "WHERE affected_stations IS NOT NULL"
+            )
+            df = pd.DataFrame(
+                self.database.cursor.fetchall(),
+                columns=['disruption_id', 'affected_stations']
+            )
+            self._save_station_links(df)
+        except Exception as e:
+            self.database.conn.rollback()
+            self.logger.warning(f" Station link backfill failed: {e}")
+
     # ------------------------------------------------------------------
     # Main entry point
     # ------------------------------------------------------------------
@@ -52,7 +127,7 @@ class ETLPipeline:
     def run(self):
         try:
             self.logger.info("\n Step 1: Extract from NS API...")
-            raw_data = self._extract()
+            raw_data, raw_records = self._extract()
             if not raw_data:
                 self.logger.warning("No data retrieved — pipeline stopping.")
                 return
@@ -64,9 +139,12 @@ class ETLPipeline:
                 return
 
             self.logger.info("\n Step 3: Load into database...")
-            self._load(raw_data, cleaned_data)
+            self._load(raw_data, raw_records, cleaned_data)
 
-            self.logger.info("\n Step 4: Generate report...")
+            self.logger.info("\n Step 4: Refresh analytics rollups...")
+            self._refresh_rollups()
+
+            self.logger.info("\n Step 5: Generate report...")
             self._generate_report()
 
             self.logger.info("\n" + "=" * 60)
@@ -78,18 +156,30 @@ class ETLPipeline:
             self.logger.exception("Full traceback:")
             raise
 
+    def close(self):
+        """
+        Release the API client's pooled HTTP session and the database
+        connection. Call once the pipeline is done (see main()).
+        """
+        self.api_client.close()
+        self.database.close()
+
     # ------------------------------------------------------------------
     # Step 1: Extract
     # ------------------------------------------------------------------
 
     def _extract(self):
+        """
+        Returns (records as dicts, the same records as canonical JSON bytes).
+        The bytes are reused for raw_disruptions.raw_json in step 3.
+        """
         try:
-            disruptions = self.api_client.fetch_disruptions()
+            disruptions, raw_records = self.api_client.fetch_disruptions()
             self.logger.info(f"   Retrieved {len(disruptions)} disruption records.")
-            return disruptions
+            return disruptions, raw_records
         except Exception as e:
             self.logger.error(f"   Extraction failed: {e}")
-            return []
+            return [], []
 
     # ------------------------------------------------------------------
     # Step 2: Transform
@@ -100,13 +190,17 @@ class ETLPipeline:
             cleaned_df = self.cleaner.clean(raw_data)
             self.logger.info(f"   {len(cleaned_df)} valid records after cleaning.")
 
+            filename = f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.parquet"
             if os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
-                out_path = Path("/tmp") / f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                out_path = Path("/tmp") / filename
             else:
-                out_path = Path("data/processed") / f"cleaned_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                out_path = Path("data/processed") / filename
                 out_path.parent.mkdir(parents=True, exist_ok=True)
 
-            cleaned_df.to_csv(out_path, index=False, encoding='utf-8-sig')
+            # Parquet via pyarrow: columnar C++ writer instead of pandas' CSV
+            # writer, keeps dtypes (tz-aware timestamps, ints) and is a fraction
+            # of the CSV size. Read back with pd.read_parquet().
+            cleaned_df.to_parquet(out_path, engine='pyarrow', compression='snappy', index=False)
             self.logger.info(f"   Saved to: {out_path}")
             return cleaned_df
         except Exception as e:
@@ -117,20 +211,23 @@ class ETLPipeline:
     # Step 3: Load
     # ------------------------------------------------------------------
 
-    def _load(self, raw_data, cleaned_data):
+    def _load(self, raw_data, raw_records, cleaned_data):
         try:
             self.logger.info("   3a. Saving raw JSON...")
-            self._save_raw_data(raw_data)
+            self._save_raw_data(raw_data, raw_records)
 
             self.logger.info("   3b. Saving cleaned records...")
-            self._save_cleaned_data(cleaned_data)
+            saved = self._save_cleaned_data(cleaned_data)
+
+            self.logger.info("   3c. Saving station links...")
+            self._save_station_links(saved)
 
             self.logger.info("   ✅ Load complete.")
         except Exception as e:
             self.logger.error(f"   Load failed: {e}")
             raise
 
-    def _save_raw_data(self, raw_data):
+    def _save_raw_data(self, raw_data, raw_records):
         """
         Insert raw JSON into raw_disruptions, skipping duplicates.
 
@@ -139,204 +236,250 @@ class ETLPipeline:
           SQLite     : INSERT OR IGNORE ...
 
         Both are idempotent — safe to re-run on the same dataset.
+
+        raw_json is the canonical encoding produced once by the API client
+        (compact orjson), so the column matches the S3 archive byte-for-byte
+        and nothing is re-serialised here.
+
+        Rows go through Database.execute_values in one transaction, so the
+        summed rowcount is the number actually inserted and
+        duplicates = len(rows) - inserted - failed. A record that can't be
+        stored is logged and skipped (on_error), as the per-row loop did,
+        so one bad raw record never stops the cleaned upsert in step 3b.
         """
-        p = self.database.placeholder   # '%s' or '?'
-        inserted = skipped = 0
-
-        for item in raw_data:
-            disruption_id = item.get('id')
-            if not disruption_id:
-                continue
-
-            raw_json = json.dumps(item, ensure_ascii=False)
-
-            try:
-                if self.database.mode == 'postgres':
-                    # ON CONFLICT DO NOTHING is PostgreSQL's clean upsert for
-                    # "insert only if not already present" — no extra SELECT needed.
-                    self.database.cursor.execute(f"""
-                        INSERT INTO raw_disruptions (disruption_id, raw_json)
-                        VALUES ({p}, {p})
-                        ON CONFLICT (disruption_id) DO NOTHING
-                    """, (disruption_id, raw_json))
-                    # rowcount == 0 means the row already existed
-                    if self.database.cursor.rowcount > 0:
-                        inserted += 1
-                    else:
-                        skipped += 1
-                else:
-                    # SQLite equivalent
-                    self.database.cursor.execute(f"""
-                        INSERT OR IGNORE INTO raw_disruptions (disruption_id, raw_json)
-                        VALUES ({p}, {p})
-                    """, (disruption_id, raw_json))
-                    if self.database.cursor.rowcount > 0:
-                        inserted += 1
-                    else:
-                        skipped += 1
-
-            except Exception as e:
-                self.logger.warning(f"      Failed to save raw record {disruption_id}: {e}")
-
-        self.database.conn.commit()
+        rows = [
+            (item['id'], raw.decode('utf-8'))
+            for item, raw in zip(raw_data, raw_records) if item.get('id')
+        ]
+
+        if self.database.mode == 'postgres':
+            # ON CONFLICT DO NOTHING is PostgreSQL's clean upsert for
+            # "insert only if not already present" — no extra SELECT needed.
+            sql = """
+                INSERT INTO raw_disruptions (disruption_id, raw_json)
+                VALUES {values}
+                ON CONFLICT (disruption_id) DO NOTHING
+            """
+        else:
+            # SQLite equivalent
+            sql = """
+                INSERT OR IGNORE INTO raw_disruptions (disruption_id, raw_json)
+                VALUES {values}
+            """
+
+        failed = []
+
+        def skip(row, e):
+            self.logger.warning(f"      Failed to save raw record {row[0]}: {e}")
+            failed.append(row[0])
+
+        try:
+            inserted = self.database.execute_values(sql, rows, width=2, on_error=skip)
+            self.database.conn.commit()
+        except Exception:
+            self.database.conn.rollback()
+            raise
+
+        skipped = len(rows) - inserted - len(failed)
         self.logger.info(f"      Inserted {inserted}, skipped {skipped} duplicates.")
 
     def _save_cleaned_data(self, df):
         """
         Upsert cleaned records into the disruptions table.
 
-        PostgreSQL-specific fixes applied here:
+        All rows go through one multi-row upsert per page (see
+        Database.execute_values) inside a single transaction:
+
+          INSERT ... VALUES (...), (...), ...
+          ON CONFLICT (disruption_id) DO UPDATE SET col = excluded.col
+
+        The syntax is identical on PostgreSQL and SQLite (>= 3.24), so only
+        the placeholder differs. It relies on the UNIQUE constraint on
+        disruption_id; is_resolved and created_at keep their stored values
+        on update, as before.
+
+        Values are made bindable by Database.to_sql_rows(), which
+        applies the PostgreSQL-specific fixes:
 
         1. Boolean type: pandas stores is_resolved as int (0/1).
            SQLite accepts integers as booleans; PostgreSQL does not.
-           Fix: wrap with bool() before passing to psycopg2.
+           Fix: cast the column to bool before binding.
+
+        2. NaT / NaN → None: PostgreSQL rejects NaN for TIMESTAMP and
+           numeric columns. Fix: datetimes are formatted column-wise with
+           .dt.strftime() and every null-like value is replaced by None
+           in one vectorised pass before building the row tuples.
+
+        A record that fails (e.g. a NULL type, or a title longer than
+        VARCHAR(500) on RDS) is logged and skipped, as with the old
+        per-record SAVEPOINTs: execute_values() retries a failed page row by
+        row under savepoints, so the rest of the batch still lands in the one
+        transaction. Note that pg8000's connection context manager closes the
+        connection, so the transaction is managed explicitly rather than with
+        `with conn:`.
+
+        Returns the rows of df that were saved.
+        """
+        # One batched existence probe up front, only to report inserted vs.
+        # updated — the upsert itself doesn't need it.
+        existing = self._existing_disruption_ids(df['disruption_id'].tolist())
+
+        # PostgreSQL refuses to upsert the same key twice within one
+        # statement, so keep only the last occurrence of each id.
+        out = self.database.to_sql_rows(
+            df.drop_duplicates('disruption_id', keep='last'), INSERT_COLS
+        )
+
+        sql = f"""
+            INSERT INTO disruptions ({', '.join(INSERT_COLS)})
+            VALUES {{values}}
+            ON CONFLICT (disruption_id) DO UPDATE SET
+                {', '.join(f'{col} = excluded.{col}' for col in UPDATE_COLS)}
+        """
+
+        failed = set()
+
+        def skip(row, e):
+            # disruption_id is INSERT_COLS[0]
+            self.logger.warning(f"      Failed to save record {row[0]}: {e}")
+            failed.add(row[0])
+
+        try:
+            # itertuples(name=None) yields plain tuples — no per-row Series
+            # and no intermediate list of all rows.
+            self.database.execute_values(
+                sql, out.itertuples(index=False, name=None), width=len(INSERT_COLS),
+                on_error=skip
+            )
+            self.database.conn.commit()
+        except Exception:
+            self.database.conn.rollback()
+            raise
+
+        saved = ~out['disruption_id'].isin(failed)
+        updated = int((saved & out['disruption_id'].isin(existing)).sum())
+        self.logger.info(f"      Inserted {int(saved.sum()) - updated}, updated {updated}.")
 
-        2. Per-record rollback via SAVEPOINTs:
-           A plain conn.rollback() undoes the entire transaction, including
-           all previously successful inserts in the same batch.
-           SAVEPOINTs let us roll back only the one failed record and
-           continue with the rest — same behaviour as SQLite's INSERT OR IGNORE.
+        return df[~df['disruption_id'].isin(failed)]
 
-        3. NaT → None: pandas NaT becomes float NaN after strftime().
-           PostgreSQL rejects NaN for TIMESTAMP columns.
-           Fix: _safe_ts() returns None for any null-like datetime value.
+    def _save_station_links(self, df):
         """
-        p = self.database.placeholder
-
-        def _safe_ts(val):
-            """Return an ISO datetime string, or None for any null-like value."""
-            if val is None:
-                return None
-            try:
-                if pd.isna(val):
-                    return None
-            except (TypeError, ValueError):
-                pass
-            try:
-                return pd.Timestamp(val).strftime('%Y-%m-%d %H:%M:%S')
-            except Exception:
-                return None
-
-        inserted = updated = 0
-
-        for _, row in df.iterrows():
-            # Set a savepoint before each record so a failure only rolls back
-            # that one record, not the entire batch.
-            if self.database.mode == 'postgres':
-                self.database.cursor.execute("SAVEPOINT sp")
-
-            try:
-                self.database.cursor.execute(
-                    f"SELECT id FROM disruptions WHERE disruption_id = {p}",
-                    (row['disruption_id'],)
-                )
-                exists = self.database.cursor.fetchone()
-
-                if exists:
-                    self.database.cursor.execute(f"""
-                        UPDATE disruptions SET
-                            type               = {p},
-                            title              = {p},
-                            description        = {p},
-                            start_time         = {p},
-                            end_time           = {p},
-                            duration_minutes   = {p},
-                            impact_level       = {p},
-                            affected_stations  = {p},
-                            updated_at         = {p}
-                        WHERE disruption_id = {p}
-                    """, (
-                        row.get('type'),
-                        row.get('title'),
-                        row.get('description'),
-                        _safe_ts(row.get('start_time')),
-                        _safe_ts(row.get('end_time')),
-                        row.get('duration_minutes') if pd.notna(row.get('duration_minutes')) else None,
-                        row.get('impact_level'),
-                        row.get('affected_stations'),
-                        _safe_ts(row.get('updated_at')),
-                        row['disruption_id']
-                    ))
-                    if self.database.mode == 'postgres':
-                        self.database.cursor.execute("RELEASE SAVEPOINT sp")
-                    updated += 1
-                else:
-                    self.database.cursor.execute(f"""
-                        INSERT INTO disruptions (
-                            disruption_id, type, title, description,
-                            start_time, end_time, duration_minutes,
-                            impact_level, affected_stations,
-                            is_resolved, created_at, updated_at
-                        ) VALUES ({p},{p},{p},{p},{p},{p},{p},{p},{p},{p},{p},{p})
-                    """, (
-                        row['disruption_id'],
-                        row.get('type'),
-                        row.get('title'),
-                        row.get('description'),
-                        _safe_ts(row.get('start_time')),
-                        _safe_ts(row.get('end_time')),
-                        row.get('duration_minutes') if pd.notna(row.get('duration_minutes')) else None,
-                        row.get('impact_level'),
-                        row.get('affected_stations'),
-                        bool(row.get('is_resolved', False)),  # int → bool for PostgreSQL
-                        _safe_ts(row.get('created_at')),
-                        _safe_ts(row.get('updated_at'))
-                    ))
-                    if self.database.mode == 'postgres':
-                        self.database.cursor.execute("RELEASE SAVEPOINT sp")
-                    inserted += 1
-
-            except Exception as e:
-                self.logger.warning(f"      Failed to save record {row['disruption_id']}: {e}")
-                # Roll back only this record, keeping all previous inserts intact
-                if self.database.mode == 'postgres':
-                    self.database.cursor.execute("ROLLBACK TO SAVEPOINT sp")
-                else:
-                    self.database.conn.rollback()
-
-        self.database.conn.commit()
-        self.logger.info(f"      Inserted {inserted}, updated {updated}.")
+        Replace the disruption_stations rows for every disruption in the batch.
+
+        The links are derived from affected_stations by the cleaner; stale
+        links of a re-loaded disruption are deleted first (chunked
+        WHERE disruption_id IN (...), see Database.execute_chunked), then
+        the current ones are inserted with execute_values — one transaction.
+        A link that can't be stored is logged and skipped.
+        """
+        links = self.cleaner.extract_station_links(df)
+        ids = df['disruption_id'].dropna().unique().tolist()
+
+        def skip(row, e):
+            self.logger.warning(f"      Failed to save station link {row}: {e}")
+
+        try:
+            self.database.execute_chunked(
+                "DELETE FROM disruption_stations WHERE disruption_id IN ({placeholders})", ids
+            )
+            self.database.execute_values(
+                "INSERT INTO disruption_stations (disruption_id, station_code) VALUES {values}",
+                links.itertuples(index=False, name=None), width=2, on_error=skip
+            )
+            self.database.conn.commit()
+        except Exception:
+            self.database.conn.rollback()
+            raise
+
+        self.logger.info(f"      Linked {len(links)} station(s).")
+
+    def _existing_disruption_ids(self, ids):
+        """
+        Return the subset of ids already present in the disruptions table,
+        probing the unique index once per chunk (Database.execute_chunked).
+        """
+        rows = self.database.execute_chunked(
+            "SELECT disruption_id FROM disruptions WHERE disruption_id IN ({placeholders})", ids
+        )
+        return {row[0] for row in rows}
 
     # ------------------------------------------------------------------
-    # Step 4: Report
+    # Step 4: Rollups
+    # ------------------------------------------------------------------
+
+    def _refresh_rollups(self):
+        """
+        Rebuild mv_daily_counts and mv_station_impact from disruptions.
+
+        The dashboard queries in aggregators.py read these tables instead of
+        re-aggregating disruptions on every call; the station rollup is fed
+        from the disruption_stations junction table written in step 3c.
+        Each table is emptied and refilled with INSERT ... SELECT inside one
+        transaction, so readers see either the old or the new rollup.
+
+        A failed refresh leaves the previous rollup in place and only logs a
+        warning — the load itself has already been committed.
+        """
+        statements = (*REFRESH_DAILY_COUNTS, *REFRESH_STATION_IMPACT)
+
+        try:
+            for stmt in statements:
+                self.database.cursor.execute(stmt)
+            self.database.conn.commit()
+            self.logger.info("   Rollups refreshed.")
+        except Exception as e:
+            self.database.conn.rollback()
+            self.logger.warning(f"   Rollup refresh failed: {e}")
+
+    # ------------------------------------------------------------------
+    # Step 5: Report
     # ------------------------------------------------------------------
 
     def _generate_report(self):
         """
         Query today's stats from the database.
 
-        Date truncation syntax differs by backend:
-          PostgreSQL : created_at::DATE = CURRENT_DATE
-          SQLite     : DATE(created_at) = DATE('now')
+        "Today" is a half-open range on the raw column, so the
+        idx_disruptions_created_at index can be range-scanned
+        (wrapping created_at in DATE() would force a full table scan):
+          PostgreSQL : created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + 1 day
+          SQLite     : created_at >= DATE('now') AND created_at < DATE('now', '+1 day')
+
+        One GROUP BY type pass returns a row per type; the totals are
+        reduced in Python.
         """
         try:
             if self.database.mode == 'postgres':
-                date_filter = "created_at::DATE = CURRENT_DATE"
+                date_filter = "created_at >= CURRENT_DATE AND created_at < CURRENT_DATE + INTERVAL '1 day'"
             else:
-                date_filter = "DATE(created_at) = DATE('now')"
+                date_filter = "created_at >= DATE('now') AND created_at < DATE('now', '+1 day')"
 
             self.database.cursor.execute(f"""
                 SELECT
-                    COUNT(*)                                                  AS total,
-                    SUM(CASE WHEN type = 'disruption'  THEN 1 ELSE 0 END)   AS disruptions,
-                    SUM(CASE WHEN type = 'maintenance' THEN 1 ELSE 0 END)   AS maintenance,
-                    SUM(CASE WHEN type = 'calamity'    THEN 1 ELSE 0 END)   AS calamity,
-                    AVG(duration_minutes)                                     AS avg_duration,
-                    MAX(impact_level)                                         AS max_impact
+                    type,
+                    COUNT(*)                  AS total,
+                    SUM(duration_minutes)     AS duration_sum,
+                    COUNT(duration_minutes)   AS duration_count,
+                    MAX(impact_level)         AS max_impact
                 FROM disruptions
                 WHERE {date_filter}
+                GROUP BY type
             """)
 
-            stats = self.database.cursor.fetchone()
+            rows = self.database.cursor.fetchall()
+            counts = {row[0]: row[1] for row in rows}
+            duration_sum = sum(row[2] or 0 for row in rows)
+            duration_count = sum(row[3] for row in rows)
+            max_impact = max((row[4] for row in rows if row[4] is not None), default=None)
 
             self.logger.info("\n   📈 Today's stats:")
-            self.logger.info(f"      Total records  : {stats[0]}")
-            self.logger.info(f"      Disruptions    : {stats[1]}")
-            self.logger.info(f"      Maintenance    : {stats[2]}")
-            self.logger.info(f"      Calamities     : {stats[3]}")
-            if stats[4]:
-                self.logger.info(f"      Avg duration   : {stats[4]:.1f} min")
-            self.logger.info(f"      Max impact     : {stats[5]}")
+            self.logger.info(f"      Total records  : {sum(counts.values())}")
+            self.logger.info(f"      Disruptions    : {counts.get('disruption', 0)}")
+            self.logger.info(f"      Maintenance    : {counts.get('maintenance', 0)}")
+            self.logger.info(f"      Calamities     : {counts.get('calamity', 0)}")
+            if duration_count:
+                self.logger.info(f"      Avg duration   : {duration_sum / duration_count:.1f} min")
+            self.logger.info(f"      Max impact     : {max_impact}")
 
         except Exception as e:
             self.logger.warning(f"   Report generation failed: {e}")
@@ -347,6 +490,7 @@ class ETLPipeline:
 # ------------------------------------------------------------------
 
 def main():
+    pipeline = None
     try:
         pipeline = ETLPipeline()
         pipeline.run()
@@ -356,6 +500,9 @@ def main():
     except Exception as e:
         print(f"\n Pipeline failed: {e}")
         sys.exit(1)
+    finally:
+        if pipeline is not None:
+            pipeline.close()
 
 
 if __name__ == "__main__":
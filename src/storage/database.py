@@ -1,9 +1,12 @@
 # src/storage/database.py
 
 import os
+import re
 import sqlite3
 import time
+from itertools import islice
 from pathlib import Path
+import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,6 +17,8 @@ RDS_DBNAME   = os.getenv('AWS_RDS_DBNAME', 'postgres')
 RDS_USER     = os.getenv('AWS_RDS_USER', 'postgres')
 RDS_PASSWORD = os.getenv('AWS_RDS_PASSWORD')
 
+SCHEMA_PATH = Path(__file__).with_name('schema.sql')
+
 
 class Database:
     """
@@ -88,6 +93,31 @@ class Database:
         self.cursor = self.conn.cursor()
         print(f"✅ Connected to SQLite: {db_path}")
 
+    def apply_perf_pragmas(self):
+        """
+        Per-connection SQLite tuning for batch loads (no-op on PostgreSQL):
+          journal_mode=WAL     readers don't block the writer; commits append
+                               to the WAL instead of rewriting the main file
+          synchronous=NORMAL   fsync at checkpoints, not on every commit
+                               (safe with WAL — a crash can only lose the
+                               last transactions, never corrupt the file)
+          temp_store=MEMORY    sorts / temp b-trees stay in RAM
+          cache_size=-64000    ~64 MB page cache (negative = KiB)
+
+        WAL mode is persistent in the database file; the rest apply to
+        this connection only, so call once after connecting.
+        """
+        if self.mode != 'sqlite':
+            return
+
+        for pragma in (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA temp_store=MEMORY",
+            "PRAGMA cache_size=-64000",
+        ):
+            self.cursor.execute(pragma)
+
     # ------------------------------------------------------------------
     # Schema management
     # ------------------------------------------------------------------
@@ -97,20 +127,263 @@ class Database:
         Run schema.sql against the active backend.
         Safe to call on every startup — IF NOT EXISTS prevents duplicates.
         """
-        schema_path = Path("src/storage/schema.sql")
-        schema_sql = schema_path.read_text(encoding='utf-8')
-
         if self.mode == 'postgres':
-            statements = [s.strip() for s in schema_sql.split(';') if s.strip()]
-            for stmt in statements:
+            for stmt in self._schema_statements():
                 self.cursor.execute(stmt)
             self.conn.commit()
             print("✅ PostgreSQL schema initialised.")
         else:
-            self.cursor.executescript(schema_sql)
+            self.cursor.executescript(SCHEMA_PATH.read_text(encoding='utf-8'))
             self.conn.commit()
             print("✅ SQLite schema initialised.")
 
+    def ensure_schema(self):
+        """
+        Create any table or index declared in schema.sql that the database
+        is missing.
+
+        initialize_schema() is a one-off setup step (and its PostgreSQL DDL
+        doesn't parse on SQLite), so tables and indexes added to schema.sql
+        later would never reach existing databases. This runs:
+          - CREATE TABLE statements, only for tables that don't exist yet
+            (the original tables use PostgreSQL-only defaults, so they're
+            skipped rather than re-parsed on SQLite)
+          - ALTER TABLE ... ADD COLUMN IF NOT EXISTS, only for columns that
+            don't exist yet (SQLite has no IF NOT EXISTS here, so the check
+            is done in Python and the clause stripped)
+          - CREATE [UNIQUE] INDEX IF NOT EXISTS statements — both backends
+            accept them, and they're no-ops once the index exists
+        schema.sql lists tables, then column migrations, then indexes, so
+        a new table's or column's indexes are created in the same pass.
+
+        The tables created here are kept in self.created_tables, and the
+        columns added as (table, column) pairs in self.added_columns, so
+        callers can run one-off backfills for them.
+        """
+        self.created_tables = set()
+        self.added_columns = set()
+
+        if not SCHEMA_PATH.exists():
+            print(f"⚠️  {SCHEMA_PATH} not found, skipping schema check.")
+            return
+
+        for stmt in self._schema_statements():
+            table = re.match(r'CREATE TABLE IF NOT EXISTS (\w+)', stmt, re.IGNORECASE)
+            column = re.match(
+                r'ALTER TABLE (\w+) ADD COLUMN IF NOT EXISTS (\w+)', stmt, re.IGNORECASE
+            )
+            if table:
+                if self._table_exists(table.group(1)):
+                    continue
+            elif column:
+                if self._column_exists(*column.groups()):
+                    continue
+                stmt = re.sub(r'\s+IF NOT EXISTS', '', stmt, count=1, flags=re.IGNORECASE)
+            elif not stmt.upper().startswith(('CREATE INDEX', 'CREATE UNIQUE INDEX')):
+                continue
+            try:
+                self.cursor.execute(stmt)
+                self.conn.commit()
+                if table:
+                    self.created_tables.add(table.group(1).lower())
+                elif column:
+                    self.added_columns.add(tuple(name.lower() for name in column.groups()))
+            except Exception as e:
+                # Don't block the load; the step that needs the object will
+                # surface its own error.
+                self.conn.rollback()
+                print(f"⚠️  Could not apply schema statement ({e}): {stmt.splitlines()[0]}")
+
+    @staticmethod
+    def _schema_statements():
+        """
+        Split schema.sql into single statements for cursor.execute().
+
+        Full-line -- comments are dropped first, so a ';' inside a comment
+        can't cut a statement in half.
+        """
+        lines = [
+            line for line in SCHEMA_PATH.read_text(encoding='utf-8').splitlines()
+            if not line.lstrip().startswith('--')
+        ]
+        return [s.strip() for s in '\n'.join(lines).split(';') if s.strip()]
+
+    def _table_exists(self, name):
+        if self.mode == 'postgres':
+            self.cursor.execute(
+                "SELECT 1 FROM information_schema.tables "
+                "WHERE table_schema = current_schema() AND table_name = %s",
+                (name,)
+            )
+        else:
+            self.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (name,)
+            )
+        return self.cursor.fetchone() is not None
+
+    def _column_exists(self, table, column):
+        if self.mode == 'postgres':
+            self.cursor.execute(
+                "SELECT 1 FROM information_schema.columns "
+                "WHERE table_schema = current_schema() AND table_name = %s AND column_name = %s",
+                (table, column)
+            )
+            return self.cursor.fetchone() is not None
+
+        self.cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in self.cursor.fetchall())
+
+    # ------------------------------------------------------------------
+    # Bulk writes
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def to_sql_rows(df, columns):
+        """
+        Return df's columns as a DataFrame of values both drivers can bind
+        (sqlite3 and pg8000):
+          - datetime columns → 'YYYY-MM-DD HH:MM:SS' strings
+          - is_resolved → bool (PostgreSQL's BOOLEAN rejects 0/1)
+          - NaN / NaT → None (PostgreSQL rejects NaN)
+
+        reindex() copies, so df is left untouched; columns missing from df
+        come back all-None. Take the rows with
+        .itertuples(index=False, name=None).
+        """
+        out = df.reindex(columns=columns)
+
+        for col in ('start_time', 'end_time', 'created_at', 'updated_at'):
+            if col not in out.columns:
+                continue
+            ts = out[col]
+            # Cleaned timestamps are already datetime64; only an all-missing
+            # (reindexed) column needs converting.
+            if not pd.api.types.is_datetime64_any_dtype(ts):
+                ts = pd.to_datetime(ts, errors='coerce')
+            out[col] = ts.dt.strftime('%Y-%m-%d %H:%M:%S')
+
+        if 'is_resolved' in out.columns:
+            out['is_resolved'] = out['is_resolved'].fillna(0).astype(bool)
+
+        return out.astype(object).where(out.notna(), None)
+
+    def execute_values(self, sql, rows, width, page_size=None, on_error=None):
+        """
+        Run an INSERT whose VALUES list holds many rows per statement.
+
+        sql contains a single {values} marker where the row groups go:
+            INSERT INTO t (a, b) VALUES {values} ON CONFLICT ...
+
+        Rows are sent page_size at a time as one multi-row statement, so N
+        rows cost ceil(N / page_size) statements. That matters most on RDS:
+        pg8000's executemany() is a loop of execute() calls, i.e. one network
+        round trip per row. Same idea as psycopg2.extras.execute_values.
+
+        The default page size keeps SQLite under its historical 999 bound-
+        parameter limit; PostgreSQL allows far more per statement.
+        Returns the total rowcount. Committing is left to the caller.
+
+        Error handling:
+          on_error=None  one bad row fails its whole page and the exception
+                         propagates. On PostgreSQL that aborts the caller's
+                         transaction, so the caller must roll back — every
+                         page written since its last commit is lost.
+          on_error=f     each page runs under a SAVEPOINT. If it fails, the
+                         page is undone and retried one row at a time, each
+                         under its own savepoint; rows that still fail are
+                         skipped and passed to f(row, exc). The good rows of
+                         the page still land, and the transaction stays usable
+                         — the per-record SAVEPOINT pattern the row-by-row
+                         upsert used, paid for only on pages that fail.
+        """
+        if page_size is None:
+            page_size = max(1, 999 // width) if self.mode == 'sqlite' else 500
+
+        group = f"({', '.join([self.placeholder] * width)})"
+        rows = iter(rows)
+        total = 0
+
+        def run(page):
+            self.cursor.execute(
+                sql.replace('{values}', ', '.join([group] * len(page))),
+                [value for row in page for value in row]
+            )
+            return max(self.cursor.rowcount, 0)
+
+        if on_error is not None and self.mode == 'sqlite' and not self.conn.in_transaction:
+            # A SAVEPOINT outside a transaction would open one of its own, and
+            # releasing it would commit — keep the caller's single transaction.
+            self.cursor.execute("BEGIN")
+
+        while True:
+            page = list(islice(rows, page_size))
+            if not page:
+                break
+            if on_error is None:
+                total += run(page)
+                continue
+
+            count, error = self._in_savepoint(run, page)
+            if error is None:
+                total += count
+                continue
+            for row in page:
+                count, error = self._in_savepoint(run, [row])
+                if error is None:
+                    total += count
+                else:
+                    on_error(row, error)
+
+        return total
+
+    def execute_chunked(self, sql, values, chunk_size=900):
+        """
+        Run a statement with an IN (...) list once per chunk of values.
+
+        sql contains a single {placeholders} marker inside the IN list:
+            SELECT disruption_id FROM disruptions
+            WHERE disruption_id IN ({placeholders})
+
+        Each chunk is one statement, so an index is probed once per chunk
+        instead of once per value. 900 keeps each statement under SQLite's
+        historical 999-variable limit (SQLITE_MAX_VARIABLE_NUMBER).
+        Returns the rows fetched across all chunks (empty for DELETE /
+        UPDATE). Committing is left to the caller.
+        """
+        values = list(values)
+        fetched = []
+
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            self.cursor.execute(
+                sql.replace('{placeholders}', ', '.join([self.placeholder] * len(chunk))),
+                chunk
+            )
+            if self.cursor.description is not None:
+                fetched.extend(self.cursor.fetchall())
+
+        return fetched
+
+    def _in_savepoint(self, fn, *args):
+        """
+        Call fn(*args) under a SAVEPOINT and return (result, None), or
+        (None, exc) after rolling back to the savepoint if fn raised.
+
+        fn's error is returned rather than raised so that a failure of the
+        SAVEPOINT statements themselves (e.g. a dropped connection) still
+        propagates instead of being reported as a bad row.
+        """
+        self.cursor.execute("SAVEPOINT execute_values")
+        try:
+            result = fn(*args)
+        except Exception as e:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT execute_values")
+            self.cursor.execute("RELEASE SAVEPOINT execute_values")
+            return None, e
+        self.cursor.execute("RELEASE SAVEPOINT execute_values")
+        return result, None
+
     # ------------------------------------------------------------------
     # Utilities
     # ------------------------------------------------------------------
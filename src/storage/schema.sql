@@ -31,6 +31,11 @@ CREATE TABLE IF NOT EXISTS disruptions (
     created_at         TIMESTAMP DEFAULT NOW(),
     updated_at         TIMESTAMP DEFAULT NOW(),
 
+    -- start_time / end_time as Julian day numbers (written by the cleaner),
+    -- so interval arithmetic in SQL is a plain subtraction
+    start_jd           FLOAT,
+    end_jd             FLOAT,
+
     FOREIGN KEY (disruption_id) REFERENCES raw_disruptions(disruption_id)
 );
 
@@ -56,6 +61,42 @@ CREATE TABLE IF NOT EXISTS daily_stats (
     calculated_at           TIMESTAMP DEFAULT NOW()
 );
 
+-- Table 5: Daily rollup per type (refreshed by the ETL after each load)
+-- Read by the dashboard queries in transformation/aggregators.py
+CREATE TABLE IF NOT EXISTS mv_daily_counts (
+    disruption_date    DATE,
+    type               VARCHAR(50) NOT NULL,
+    incident_count     INTEGER NOT NULL,
+    duration_sum       FLOAT,
+    duration_count     INTEGER NOT NULL,
+    max_impact         INTEGER
+);
+
+-- Table 6: One row per (disruption, affected station)
+-- Normalised form of disruptions.affected_stations, written at load time
+-- so station analytics join it instead of splitting the CSV column in SQL
+CREATE TABLE IF NOT EXISTS disruption_stations (
+    disruption_id    VARCHAR(100) NOT NULL,
+    station_code     VARCHAR(20) NOT NULL,
+    PRIMARY KEY (disruption_id, station_code),
+    FOREIGN KEY (disruption_id) REFERENCES disruptions(disruption_id)
+);
+
+-- Table 7: Per-station rollup (refreshed by the ETL after each load)
+CREATE TABLE IF NOT EXISTS mv_station_impact (
+    station_code          VARCHAR(20) PRIMARY KEY,
+    total_disruptions     INTEGER NOT NULL,
+    avg_duration_minutes  FLOAT,
+    avg_impact_level      FLOAT
+);
+
+-- ============================================
+-- Column migrations for databases created before a column was added
+-- (applied by Database.ensure_schema, no-ops once the column exists)
+-- ============================================
+ALTER TABLE disruptions ADD COLUMN IF NOT EXISTS start_jd FLOAT;
+ALTER TABLE disruptions ADD COLUMN IF NOT EXISTS end_jd FLOAT;
+
 -- ============================================
 -- Indexes
 -- ============================================
@@ -71,6 +112,28 @@ CREATE INDEX IF NOT EXISTS idx_disruptions_start_time
 CREATE INDEX IF NOT EXISTS idx_disruptions_impact
     ON disruptions(impact_level);
 
+-- Per-type time-range filters (type equality, then start_time range)
+CREATE INDEX IF NOT EXISTS idx_disruptions_type_start
+    ON disruptions(type, start_time);
+
+-- Expression index matching GROUP BY DATE(start_time), type in the daily
+-- rollup refresh, so the groups are read in order without a sort —
+-- the extra parentheses are required by PostgreSQL and accepted by SQLite
+CREATE INDEX IF NOT EXISTS idx_disruptions_start_date
+    ON disruptions((DATE(start_time)), type);
+
+-- Overlap self-join: the still-active side filters on end_time > cutoff
+-- (the recent side already range-scans idx_disruptions_start_time)
+CREATE INDEX IF NOT EXISTS idx_disruptions_end_time
+    ON disruptions(end_time);
+
+CREATE INDEX IF NOT EXISTS idx_ds_station
+    ON disruption_stations(station_code);
+
+-- Daily report filters on a half-open created_at range
+CREATE INDEX IF NOT EXISTS idx_disruptions_created_at
+    ON disruptions(created_at);
+
 -- ============================================
 -- Seed station data
 -- INSERT ... ON CONFLICT DO NOTHING is PostgreSQL's
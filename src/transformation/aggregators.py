@@ -6,28 +6,102 @@ These queries demonstrate patterns commonly used in Analytics Engineering:
 - Window functions for ranking, rolling aggregates, and lag/lead
 - Correlated subqueries
 - Safe division with NULLIF
-- String-to-row unnesting
+- Pre-aggregated rollup tables fed from a station junction table
 
 All queries are designed to run against the disruptions / stations / daily_stats schema.
+The dashboard queries (1, 2, 3 and 5) read the pre-aggregated rollup tables
+mv_daily_counts and mv_station_impact instead of re-aggregating disruptions on
+every call; the ETL refreshes those tables after each load (see ROLLUP section).
+
+Queries 1, 5 and 6 only look at a recent window. The window start is a bound
+parameter, :cutoff, instead of date('now', ...) in the SQL text, so the
+statement text never changes and sqlite3's statement cache (128 statements
+per connection by default) reuses the prepared plan:
+
+    conn.execute(ROLLING_TREND_QUERY, {'cutoff': cutoff_date(TREND_WINDOW_DAYS)})
 """
 
+from datetime import datetime, timedelta, timezone
+
+
+TREND_WINDOW_DAYS = 30      # queries 1 and 5
+OVERLAP_WINDOW_DAYS = 7     # query 6
+
+
+def cutoff_date(days, now=None):
+    """
+    Start of a window covering the last `days` days, as 'YYYY-MM-DD' in UTC —
+    the same value SQLite's date('now', '-N days') would produce.
+    """
+    now = now or datetime.now(timezone.utc)
+    return (now - timedelta(days=days)).strftime('%Y-%m-%d')
+
+
+# ──────────────────────────────────────────────────────────────────
+# ROLLUP TABLES: materialised daily / per-station aggregates
+# Refreshed by the pipeline after every load with DELETE + INSERT ... SELECT
+# in one transaction, so readers never see a half-built rollup.
+# The tables themselves are declared in storage/schema.sql.
+# ──────────────────────────────────────────────────────────────────
+# Sum and count are stored separately (not an average) so that averages
+# over several types or days can still be computed exactly from the rollup.
+REFRESH_DAILY_COUNTS = (
+    "DELETE FROM mv_daily_counts",
+    """
+    INSERT INTO mv_daily_counts (
+        disruption_date, type, incident_count,
+        duration_sum, duration_count, max_impact
+    )
+    SELECT
+        DATE(start_time),
+        type,
+        COUNT(*),
+        SUM(duration_minutes),
+        COUNT(duration_minutes),
+        MAX(impact_level)
+    FROM disruptions
+    GROUP BY DATE(start_time), type
+    """,
+)
+
+# Station codes come from the disruption_stations junction table (one row
+# per disruption/station), so no CSV splitting is needed and the same SQL
+# runs on both backends.
+REFRESH_STATION_IMPACT = (
+    "DELETE FROM mv_station_impact",
+    """
+    INSERT INTO mv_station_impact (
+        station_code, total_disruptions,
+        avg_duration_minutes, avg_impact_level
+    )
+    SELECT
+        ds.station_code,
+        COUNT(*),                   -- (disruption_id, station_code) is the PK,
+        AVG(d.duration_minutes),    -- so no DISTINCT (and no sort) is needed
+        AVG(d.impact_level)
+    FROM disruption_stations ds
+    JOIN disruptions d ON d.disruption_id = ds.disruption_id
+    GROUP BY ds.station_code
+    """,
+)
+
 
 # ──────────────────────────────────────────────────────────────────
 # QUERY 1: 30-Day Disruption Trend with 7-Day Rolling Average
 # Business question: "Is the number of disruptions increasing or decreasing?"
-# Techniques: CTE, window function with ROWS BETWEEN frame
+# Techniques: CTE, named WINDOW with ROWS BETWEEN frame
+# Parameters: :cutoff = cutoff_date(TREND_WINDOW_DAYS)
 # ──────────────────────────────────────────────────────────────────
 ROLLING_TREND_QUERY = """
 WITH daily_counts AS (
-    -- Step 1: Aggregate raw disruptions to daily level
+    -- Step 1: Daily level per type, read from the rollup
     SELECT
-        DATE(start_time)    AS disruption_date,
+        disruption_date,
         type,
-        COUNT(*)            AS incident_count,
-        AVG(duration_minutes) AS avg_duration_minutes
-    FROM disruptions
-    WHERE start_time >= date('now', '-30 days')
-    GROUP BY DATE(start_time), type
+        incident_count,
+        duration_sum / NULLIF(duration_count, 0) AS avg_duration_minutes
+    FROM mv_daily_counts
+    WHERE disruption_date >= :cutoff
 )
 SELECT
     disruption_date,
@@ -36,23 +110,23 @@ SELECT
     ROUND(avg_duration_minutes, 1)          AS avg_duration_minutes,
 
     -- 7-day rolling sum (sliding window, not calendar week)
-    -- ROWS BETWEEN 6 PRECEDING AND CURRENT ROW = last 7 rows including today
-    SUM(incident_count) OVER (
-        PARTITION BY type
-        ORDER BY disruption_date
-        ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-    )                                       AS rolling_7day_total,
+    SUM(incident_count) OVER last_7_days    AS rolling_7day_total,
 
     -- 7-day rolling average
-    ROUND(
-        AVG(incident_count) OVER (
-            PARTITION BY type
-            ORDER BY disruption_date
-            ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-        ), 2
-    )                                       AS rolling_7day_avg
+    ROUND(AVG(incident_count) OVER last_7_days, 2)
+                                            AS rolling_7day_avg
 
 FROM daily_counts
+-- One named frame shared by SUM and AVG, so both are computed in a single
+-- window pass. SQLite (>= 3.28) and PostgreSQL maintain SUM/AVG over a
+-- ROWS frame incrementally (add the row entering, remove the row leaving),
+-- so this is already O(rows), not O(rows × 7).
+-- ROWS BETWEEN 6 PRECEDING AND CURRENT ROW = last 7 rows including today
+WINDOW last_7_days AS (
+    PARTITION BY type
+    ORDER BY disruption_date
+    ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+)
 ORDER BY disruption_date DESC, incident_count DESC;
 """
 
@@ -60,32 +134,26 @@ ORDER BY disruption_date DESC, incident_count DESC;
 # ──────────────────────────────────────────────────────────────────
 # QUERY 2: Station Severity Percentile Ranking
 # Business question: "Which stations are in the worst-performing 10%?"
-# Techniques: CTE, PERCENT_RANK(), string unnesting with json_each
+# Techniques: CTE, PERCENT_RANK(), pre-aggregated rollup table
 # ──────────────────────────────────────────────────────────────────
 STATION_SEVERITY_QUERY = """
-WITH unnested_stations AS (
-    -- Step 1: Explode comma-separated station codes into individual rows
-    -- affected_stations stores: "ASD,UTR,RTD" → we need one row per station
+WITH station_aggregates AS (
+    -- Per-station metrics; the CSV unnest of affected_stations
+    -- ("ASD,UTR,RTD" → one row per station) happens at refresh time
     SELECT
-        d.disruption_id,
-        d.impact_level,
-        d.duration_minutes,
-        TRIM(s.value)   AS station_code
-    FROM disruptions d,
-    -- Wrap CSV in JSON array format, then unnest with json_each
-    json_each('["' || REPLACE(d.affected_stations, ',', '","') || '"]') s
-    WHERE d.affected_stations IS NOT NULL
+        station_code,
+        total_disruptions,
+        avg_duration_minutes,
+        avg_impact_level
+    FROM mv_station_impact
 ),
-station_aggregates AS (
-    -- Step 2: Calculate per-station metrics
+ranked AS (
+    -- Evaluate PERCENT_RANK once; the percentile column and both
+    -- risk thresholds below reuse it
     SELECT
-        station_code,
-        COUNT(DISTINCT disruption_id)   AS total_disruptions,
-        AVG(duration_minutes)           AS avg_duration_minutes,
-        AVG(impact_level)               AS avg_impact_level,
-        MAX(impact_level)               AS max_impact_level
-    FROM unnested_stations
-    GROUP BY station_code
+        sa.*,
+        PERCENT_RANK() OVER (ORDER BY sa.total_disruptions) AS pr
+    FROM station_aggregates sa
 )
 SELECT
     sa.station_code,
@@ -95,10 +163,7 @@ SELECT
     ROUND(sa.avg_impact_level, 2)       AS avg_impact_level,
 
     -- Percentile rank: 0.0 = least disrupted, 1.0 = most disrupted
-    ROUND(
-        PERCENT_RANK() OVER (ORDER BY sa.total_disruptions),
-        3
-    )                                   AS disruption_percentile,
+    ROUND(sa.pr, 3)                     AS disruption_percentile,
 
     -- Dense rank (no gaps in ranking sequence)
     DENSE_RANK() OVER (
@@ -107,14 +172,12 @@ SELECT
 
     -- Flag worst stations (top 10% by disruption count)
     CASE
-        WHEN PERCENT_RANK() OVER (ORDER BY sa.total_disruptions) > 0.9
-        THEN 'HIGH RISK'
-        WHEN PERCENT_RANK() OVER (ORDER BY sa.total_disruptions) > 0.7
-        THEN 'MEDIUM RISK'
+        WHEN sa.pr > 0.9 THEN 'HIGH RISK'
+        WHEN sa.pr > 0.7 THEN 'MEDIUM RISK'
         ELSE 'LOW RISK'
     END                                 AS risk_category
 
-FROM station_aggregates sa
+FROM ranked sa
 LEFT JOIN stations st ON sa.station_code = st.station_code
 ORDER BY sa.total_disruptions DESC;
 """
@@ -123,53 +186,63 @@ ORDER BY sa.total_disruptions DESC;
 # ──────────────────────────────────────────────────────────────────
 # QUERY 3: Day-over-Day Change Analysis with LAG/LEAD
 # Business question: "How did today's disruptions compare to yesterday?"
-# Techniques: LAG(), LEAD(), NULLIF for safe division, pct change
+# Techniques: FILTER pivot, LAG(), LEAD(), NULLIF for safe division, pct change
 # ──────────────────────────────────────────────────────────────────
 DAY_OVER_DAY_QUERY = """
 WITH daily_summary AS (
+    -- Pivot the per-type rollup rows (O(days × types), not O(disruptions))
+    -- into one row per day; COALESCE keeps 0 for days without that type
     SELECT
-        DATE(start_time)            AS disruption_date,
-        COUNT(*)                    AS total_disruptions,
-        SUM(CASE WHEN type = 'calamity' THEN 1 ELSE 0 END)     AS calamities,
-        SUM(CASE WHEN type = 'maintenance' THEN 1 ELSE 0 END)   AS maintenance,
-        SUM(CASE WHEN type = 'disruption' THEN 1 ELSE 0 END)    AS disruptions,
-        ROUND(AVG(duration_minutes), 1)     AS avg_duration,
-        MAX(impact_level)                   AS max_impact
-    FROM disruptions
-    GROUP BY DATE(start_time)
+        disruption_date,
+        SUM(incident_count)         AS total_disruptions,
+        COALESCE(SUM(incident_count) FILTER (WHERE type = 'calamity'), 0)    AS calamities,
+        COALESCE(SUM(incident_count) FILTER (WHERE type = 'maintenance'), 0) AS maintenance,
+        COALESCE(SUM(incident_count) FILTER (WHERE type = 'disruption'), 0)  AS disruptions,
+        ROUND(SUM(duration_sum) / NULLIF(SUM(duration_count), 0), 1)       AS avg_duration,
+        MAX(max_impact)                     AS max_impact
+    FROM mv_daily_counts
+    GROUP BY disruption_date
+),
+daily_with_lag AS (
+    -- Evaluate the LAG window once; the delta and pct change below reuse it
+    SELECT
+        ds.*,
+
+        -- Previous day's count (LAG looks backward in the window)
+        LAG(total_disruptions, 1) OVER by_day   AS prev_day_total,
+
+        -- Next day's count (LEAD looks forward — useful for forecasting views)
+        LEAD(total_disruptions, 1) OVER by_day  AS next_day_total,
+
+        -- 7-day running total for context (incrementally maintained frame)
+        SUM(total_disruptions) OVER (
+            by_day ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
+        )                                       AS rolling_7day
+    FROM daily_summary ds
+    -- All three windows share one ordering, so the rows are sorted once
+    WINDOW by_day AS (ORDER BY disruption_date)
 )
 SELECT
     disruption_date,
     total_disruptions,
     avg_duration,
     max_impact,
-
-    -- Previous day's count (LAG looks backward in the window)
-    LAG(total_disruptions, 1) OVER (ORDER BY disruption_date) AS prev_day_total,
-
-    -- Next day's count (LEAD looks forward — useful for forecasting views)
-    LEAD(total_disruptions, 1) OVER (ORDER BY disruption_date) AS next_day_total,
+    prev_day_total,
+    next_day_total,
 
     -- Absolute day-over-day change
-    total_disruptions
-        - LAG(total_disruptions, 1) OVER (ORDER BY disruption_date)
-                                        AS dod_delta,
+    total_disruptions - prev_day_total  AS dod_delta,
 
     -- Percentage change (NULLIF prevents division-by-zero)
     ROUND(
-        100.0
-        * (total_disruptions - LAG(total_disruptions, 1) OVER (ORDER BY disruption_date))
-        / NULLIF(LAG(total_disruptions, 1) OVER (ORDER BY disruption_date), 0),
+        100.0 * (total_disruptions - prev_day_total)
+        / NULLIF(prev_day_total, 0),
         1
     )                                   AS dod_pct_change,
 
-    -- 7-day running total for context
-    SUM(total_disruptions) OVER (
-        ORDER BY disruption_date
-        ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
-    )                                   AS rolling_7day
+    rolling_7day
 
-FROM daily_summary
+FROM daily_with_lag
 ORDER BY disruption_date DESC;
 """
 
@@ -222,42 +295,36 @@ LIMIT 20;
 # QUERY 5: Cancellation Rate with Correlated Subquery + Full Metrics
 # Business question: "What % of disruptions end in cancellation per day?"
 # Techniques: Correlated subquery, FILTER clause, window partitioning
+# Parameters: :cutoff = cutoff_date(TREND_WINDOW_DAYS)
 # This is the main "executive dashboard" query
 # ──────────────────────────────────────────────────────────────────
 COMPLEX_ANALYTICS_QUERY = """
 WITH disruption_metrics AS (
-    -- Step 1: Daily metrics per disruption type
+    -- Step 1: Daily metrics per disruption type (from the rollup)
     SELECT
-        DATE(start_time)    AS disruption_date,
+        disruption_date,
         type,
-        COUNT(*)            AS incident_count,
-        AVG(
-            CAST((julianday(end_time) - julianday(start_time)) * 1440 AS REAL)
-        )                   AS avg_duration_minutes,
-
-        -- 7-day rolling total across all types on this date
-        SUM(COUNT(*)) OVER (
-            ORDER BY DATE(start_time)
+        incident_count,
+        duration_sum / NULLIF(duration_count, 0) AS avg_duration_minutes,
+
+        -- 7-day rolling total for this type (one rollup row per type and
+        -- day, so the frame is the type's last 7 active days)
+        SUM(incident_count) OVER (
+            PARTITION BY type
+            ORDER BY disruption_date
             ROWS BETWEEN 6 PRECEDING AND CURRENT ROW
         )                   AS rolling_7day_total
 
-    FROM disruptions
-    WHERE start_time >= date('now', '-30 days')
-    GROUP BY DATE(start_time), type
+    FROM mv_daily_counts
+    WHERE disruption_date >= :cutoff
 ),
 station_impact AS (
     -- Step 2: Station severity percentile
     SELECT
         station_code,
-        COUNT(*)            AS disruption_count,
-        PERCENT_RANK() OVER (ORDER BY COUNT(*)) AS severity_percentile
-    FROM (
-        SELECT TRIM(value) AS station_code
-        FROM disruptions,
-        json_each('["' || REPLACE(affected_stations, ',', '","') || '"]')
-        WHERE affected_stations IS NOT NULL
-    )
-    GROUP BY station_code
+        total_disruptions   AS disruption_count,
+        PERCENT_RANK() OVER (ORDER BY total_disruptions) AS severity_percentile
+    FROM mv_station_impact
 )
 SELECT
     dm.disruption_date,
@@ -294,10 +361,28 @@ ORDER BY dm.disruption_date DESC, dm.incident_count DESC;
 # QUERY 6: Self-Join — Find Overlapping Disruptions
 # Business question: "Which disruptions were active at the same time?"
 # Techniques: Self-join with non-equijoin conditions, overlap detection
+# Parameters: :cutoff = cutoff_date(OVERLAP_WINDOW_DAYS)
 # ──────────────────────────────────────────────────────────────────
 OVERLAPPING_DISRUPTIONS_QUERY = """
 -- Self-join to find disruptions that were active simultaneously
 -- Two disruptions overlap if: A.start < B.end AND A.end > B.start
+--
+-- Both sides are narrowed before the join instead of pairing every row:
+--   recent : disruptions that started since :cutoff (the A side)
+--   active : disruptions still running at the start of that window —
+--            B.end > A.start >= cutoff, so no overlapping B is lost
+-- Each CTE range-scans its own index: recent on idx_disruptions_start_time,
+-- active on idx_disruptions_end_time.
+WITH recent AS (
+    SELECT disruption_id, type, start_time, end_time, start_jd, end_jd
+    FROM disruptions
+    WHERE start_time >= :cutoff
+),
+active AS (
+    SELECT disruption_id, type, start_time, end_time, start_jd, end_jd
+    FROM disruptions
+    WHERE end_time > :cutoff
+)
 SELECT
     a.disruption_id         AS disruption_a,
     b.disruption_id         AS disruption_b,
@@ -308,18 +393,17 @@ SELECT
     b.start_time            AS b_start,
     b.end_time              AS b_end,
 
-    -- Calculate overlap duration in minutes
+    -- Calculate overlap duration in minutes from the stored Julian days
+    -- (no per-pair julianday() string parsing)
     CAST(
-        (julianday(MIN(a.end_time, b.end_time))
-         - julianday(MAX(a.start_time, b.start_time))) * 1440
+        (MIN(a.end_jd, b.end_jd) - MAX(a.start_jd, b.start_jd)) * 1440
     AS INTEGER)             AS overlap_minutes
 
-FROM disruptions a
-JOIN disruptions b
+FROM recent a
+JOIN active b
     ON a.disruption_id < b.disruption_id  -- avoid duplicates (A,B) and (B,A)
-    AND a.start_time < b.end_time          -- overlap condition part 1
-    AND a.end_time   > b.start_time        -- overlap condition part 2
-WHERE a.start_time >= date('now', '-7 days')
+    AND b.start_time < a.end_time          -- overlap condition part 1
+    AND b.end_time   > a.start_time        -- overlap condition part 2
 ORDER BY overlap_minutes DESC
 LIMIT 50;
 """
\ No newline at end of file
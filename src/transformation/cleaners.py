@@ -1,15 +1,22 @@
 # src/transformation/cleaners.py
 
 import pandas as pd
+import numpy as np
 import json
-from datetime import datetime
+import logging
 import re
 
+# 清洗过程的步骤日志走debug级别（默认不输出）；需要时 logging.basicConfig(level=logging.DEBUG)
+_log = logging.getLogger(__name__)
+
 class DisruptionCleaner:
     """
     清洗NS API返回的延误数据
     """
     
+    # 从title中匹配车站代码（大写字母组合），类加载时编译一次
+    _TITLE_CODE_RE = re.compile(r'\b[A-Z]{2,5}\b')
+    
     def __init__(self):
         """
         初始化清洗器
@@ -33,10 +40,10 @@ class DisruptionCleaner:
             pd.DataFrame - 清洗后的数据
         """
         if not raw_data:
-            print("⚠️  没有数据需要清洗")
+            _log.warning("⚠️  没有数据需要清洗")
             return pd.DataFrame()
         
-        print(f"🧹 开始清洗 {len(raw_data)} 条记录...")
+        _log.debug("🧹 开始清洗 %d 条记录...", len(raw_data))
         
         # 步骤1: 转成DataFrame
         df = pd.DataFrame(raw_data)
@@ -56,7 +63,7 @@ class DisruptionCleaner:
         # 步骤6: 数据验证和清理
         df = self._validate_and_clean(df)
         
-        print(f"✅ 清洗完成！保留 {len(df)} 条有效记录")
+        _log.debug("✅ 清洗完成！保留 %d 条有效记录", len(df))
         
         return df
     
@@ -64,7 +71,7 @@ class DisruptionCleaner:
         """
         步骤1: 提取基本字段
         """
-        print("  📋 提取基本字段...")
+        _log.debug("  📋 提取基本字段...")
         
         # 重命名列（如果需要）
         if 'id' in df.columns:
@@ -72,14 +79,15 @@ class DisruptionCleaner:
         
         # 标准化type字段（转小写，映射到统一名称）
         if 'type' in df.columns:
-            df['type'] = df['type'].str.lower()
-            df['type'] = df['type'].map(self.type_mapping).fillna(df['type'])
+            # replace只替换映射表里有的值，其他值原样保留，一次完成（不用map再fillna）
+            # 转成category：只有几种类型，后续比较/分组按类别码进行
+            df['type'] = df['type'].str.lower().replace(self.type_mapping).astype('category')
         
         # 清理title字段（去除多余空格）
         if 'title' in df.columns:
             df['title'] = df['title'].str.strip()
             # 删除过短的标题（可能是测试数据）
-            df.loc[df['title'].str.len() < 5, 'title'] = None
+            df['title'] = df['title'].mask(df['title'].str.len() < 5, None)
         
         return df
     
@@ -87,152 +95,170 @@ class DisruptionCleaner:
         """
         步骤2: 处理时间字段
         """
-        print("  ⏰ 处理时间戳...")
+        _log.debug("  ⏰ 处理时间戳...")
         
         # 转换开始时间（统一转成UTC）
         if 'start' in df.columns:
-            df['start_time'] = pd.to_datetime(df['start'], errors='coerce', utc=True)
+            df['start_time'] = self._parse_timestamps(df['start'])
         
         # 转换结束时间
         if 'end' in df.columns:
-            df['end_time'] = pd.to_datetime(df['end'], errors='coerce', utc=True)
+            df['end_time'] = self._parse_timestamps(df['end'])
             
             # 标记进行中的延误（没有结束时间）
             df['is_ongoing'] = df['end_time'].isna()
             
             # 对于进行中的延误，设置临时结束时间为"现在+2小时"
+            # （fillna整列一次写入，不用布尔掩码的.loc赋值）
             now = pd.Timestamp.now(tz='UTC')
-            df.loc[df['is_ongoing'], 'end_time'] = now + pd.Timedelta(hours=2)
+            df['end_time'] = df['end_time'].fillna(now + pd.Timedelta(hours=2))
+        
+        # 儒略日（REAL），存进数据库供SQL直接相减，避免查询时对每行/每对调用julianday()
+        for col, jd_col in (('start_time', 'start_jd'), ('end_time', 'end_jd')):
+            if col in df.columns:
+                df[jd_col] = self._to_julian_day(df[col])
         
         return df
     
+    @staticmethod
+    def _parse_timestamps(values):
+        """
+        字符串 → UTC时间，无法解析的为NaT
+        
+        NS API的格式固定为 '2025-02-14T08:30:00+0100'：先按这个格式走pandas的C解析器
+        （cache=True 对重复的时间戳只解析一次），格式不符的少数值再交给通用解析器
+        """
+        parsed = pd.to_datetime(
+            values, format='%Y-%m-%dT%H:%M:%S%z', errors='coerce', utc=True, cache=True
+        )
+        leftover = parsed.isna() & values.notna()
+        if leftover.any():
+            parsed = parsed.fillna(pd.to_datetime(values[leftover], errors='coerce', utc=True))
+        return parsed
+    
+    @staticmethod
+    def _to_julian_day(ts):
+        """
+        时间 → 儒略日，NaT → NaN
+        
+        与SQLite的julianday()算法一致（整数毫秒 / 86400000.0），
+        并先截到整秒（数据库里存的时间字符串没有毫秒），结果逐位相同
+        不带时区的时间按UTC处理（和SQLite一样），带时区的先转成UTC
+        """
+        ts = ts.dt.tz_localize('UTC') if ts.dt.tz is None else ts.dt.tz_convert('UTC')
+        epoch_ms = (ts.dt.floor('s') - pd.Timestamp('1970-01-01', tz='UTC')) // pd.Timedelta(milliseconds=1)
+        return (epoch_ms + 210866760000000) / 86400000.0
+    
     def _calculate_metrics(self, df):
         """
         步骤3: 计算业务指标
         """
-        print("  🔢 计算业务指标...")
+        _log.debug("  🔢 计算业务指标...")
         
         # 计算持续时间（分钟）- 使用float64类型
         if 'start_time' in df.columns and 'end_time' in df.columns:
             valid_times = df['start_time'].notna() & df['end_time'].notna()
             
             # 直接用float64类型（支持NaN）
-            df['duration_minutes'] = (
-                (df['end_time'] - df['start_time']).dt.total_seconds() / 60
-            )
+            duration = (df['end_time'] - df['start_time']).dt.total_seconds().to_numpy() / 60
             
-            # 清理无效值
-            df.loc[~valid_times, 'duration_minutes'] = None
-            df.loc[df['duration_minutes'] < 0, 'duration_minutes'] = None
+            # 清理无效值（时间缺失或结束早于开始 → NaN），np.where一次生成新数组
+            df['duration_minutes'] = np.where(
+                valid_times.to_numpy() & (duration >= 0), duration, np.nan
+            )
         
         # 计算影响级别（1-5）
-        df['impact_level'] = df.apply(self._calculate_impact_level, axis=1)
+        # 规则（按顺序匹配，第一个满足的生效）：
+        # - 灾难（calamity）: 5级
+        # - 取消（cancellation）: 5级
+        # - 维护（maintenance）且>4小时: 4级
+        # - 维护（maintenance）且<4小时: 3级
+        # - 延误（disruption）且>2小时: 4级
+        # - 延误（disruption）且>1小时: 3级
+        # - 其他: 2级
+        # 用np.select对整列一次性计算，不再逐行调用Python函数
+        if 'type' in df.columns:
+            # type是category，先转回object再填空值（category不能直接填入新类别''）
+            t = df['type'].astype(object).fillna('').astype(str)
+        else:
+            t = pd.Series('', index=df.index)
         
-        return df
-    
-    def _calculate_impact_level(self, row):
-        """
-        业务逻辑：根据类型和持续时间计算影响级别
-        
-        规则：
-        - 取消（cancellation）: 5级
-        - 灾难（calamity）: 5级
-        - 维护（maintenance）且>4小时: 4级
-        - 维护（maintenance）且<4小时: 3级
-        - 延误（disruption）且>2小时: 4级
-        - 延误（disruption）且>1小时: 3级
-        - 其他: 2级
-        """
-        disruption_type = row.get('type', '')
-        duration = row.get('duration_minutes', 0)
-        
-        # 处理缺失值
-        if pd.isna(duration):
-            duration = 0
-        
-        # 应用规则
-        if disruption_type == 'calamity':
-            return 5
-        elif 'cancel' in str(disruption_type).lower():
-            return 5
-        elif disruption_type == 'maintenance':
-            if duration > 240:  # 4小时
-                return 4
-            else:
-                return 3
-        elif disruption_type == 'disruption':
-            if duration > 120:  # 2小时
-                return 4
-            elif duration > 60:  # 1小时
-                return 3
-            else:
-                return 2
+        # 缺失的持续时间按0处理
+        if 'duration_minutes' in df.columns:
+            d = df['duration_minutes'].fillna(0).to_numpy()
         else:
-            return 2
+            d = np.zeros(len(df))
+        
+        conds = [
+            t.eq('calamity'),
+            t.str.lower().str.contains('cancel', regex=False),
+            t.eq('maintenance') & (d > 240),   # 4小时
+            t.eq('maintenance'),
+            t.eq('disruption') & (d > 120),    # 2小时
+            t.eq('disruption') & (d > 60),     # 1小时
+        ]
+        choices = [5, 5, 4, 3, 4, 3]
+        df['impact_level'] = np.select(conds, choices, default=2)
+        
+        return df
     
     def _extract_stations(self, df):
         """
         步骤4: 提取受影响的车站
         """
-        print("  🚉 提取受影响车站...")
+        _log.debug("  🚉 提取受影响车站...")
         
-        affected_stations_list = []
+        # 用位置索引对齐，避免输入的index有重复
+        positions = pd.RangeIndex(len(df))
+        codes = []
         
-        for idx, row in df.iterrows():
-            stations = set()  # 用set避免重复
-            
-            try:
-                # 方法1: 从'section'字段提取
-                if 'section' in row:
-                    section = row['section']
-                    # 安全的检查方式
-                    if section is not None and not (isinstance(section, float) and pd.isna(section)):
-                        if isinstance(section, dict):
-                            # 提取起点和终点
-                            if 'stations' in section and section['stations']:
-                                for station in section['stations']:
-                                    if isinstance(station, dict) and 'uicCode' in station:
-                                        stations.add(station['uicCode'])
-                
-                # 方法2: 从'timespans'字段提取
-                if 'timespans' in row:
-                    timespans = row['timespans']
-                    if timespans is not None and not (isinstance(timespans, float) and pd.isna(timespans)):
-                        if isinstance(timespans, list):
-                            for timespan in timespans:
-                                if isinstance(timespan, dict) and 'situation' in timespan:
-                                    situation = timespan['situation']
-                                    if isinstance(situation, dict) and 'stations' in situation:
-                                        for station in situation['stations']:
-                                            if isinstance(station, dict):
-                                                code = station.get('stationCode', '')
-                                                if code:
-                                                    stations.add(code)
-                
-                # 方法3: 从title中提取（作为备选）
-                if not stations and 'title' in row:
-                    title = row.get('title', '')
-                    if isinstance(title, str):
-                        # 简单的正则匹配大写字母组合
-                        potential_codes = re.findall(r'\b[A-Z]{2,5}\b', title)
-                        stations.update(potential_codes)
-            
-            except Exception as e:
-                # 单条记录失败不影响整体
-                pass
-            
-            # 转成逗号分隔的字符串
-            affected_stations_list.append(','.join(sorted(stations)) if stations else None)
+        # 方法1: 从'section'字段提取 section.stations[*].uicCode
+        if 'section' in df.columns:
+            codes.append(self._nested_codes(df['section'].set_axis(positions), 'stations', 'uicCode'))
+        
+        # 方法2: 从'timespans'字段提取 timespans[*].situation.stations[*].stationCode
+        if 'timespans' in df.columns:
+            timespans = df['timespans'].set_axis(positions)
+            timespans = timespans[timespans.map(lambda x: isinstance(x, list))].explode()
+            situations = timespans[timespans.map(lambda x: isinstance(x, dict))].astype(object).str.get('situation')
+            codes.append(self._nested_codes(situations, 'stations', 'stationCode'))
+        
+        codes = pd.concat(codes) if codes else pd.Series(dtype=object)
+        codes = codes[codes.notna() & codes.ne('')].astype(str)
+        
+        # 方法3: 从title中提取（作为备选，只用于上面没找到车站的记录）
+        if 'title' in df.columns:
+            titles = df['title'].set_axis(positions)
+            titles = titles[~positions.isin(codes.index) & titles.map(lambda x: isinstance(x, str))].astype(object)
+            title_codes = titles.str.findall(self._TITLE_CODE_RE).explode().dropna()
+            codes = pd.concat([codes, title_codes])
         
-        df['affected_stations'] = affected_stations_list
+        # 每条记录去重排序，转成逗号分隔的字符串；没有车站的为None
+        stations = codes.groupby(level=0).agg(lambda s: ','.join(sorted(set(s))))
+        stations = stations.reindex(positions)
+        df['affected_stations'] = stations.astype(object).where(stations.notna(), None).to_numpy()
         
         return df
     
+    @staticmethod
+    def _nested_codes(series, list_key, code_key):
+        """
+        展开series中每个dict的list_key列表，取出每个元素的code_key
+        （非dict的值直接跳过，返回的Series保留原来的位置索引）
+        
+        过滤后先转object：整列都是null时pandas会推断成float64，
+        空的float64 Series不能用.str访问器
+        """
+        items = series[series.map(lambda x: isinstance(x, dict))].astype(object)
+        items = items.str.get(list_key).explode()
+        items = items[items.map(lambda x: isinstance(x, dict))].astype(object)
+        return items.str.get(code_key)
+    
     def _validate_and_clean(self, df):
         """
         步骤6: 数据验证和最终清理
         """
-        print("  ✓ 验证数据质量...")
+        _log.debug("  ✓ 验证数据质量...")
         
         # 删除没有disruption_id的记录
         if 'disruption_id' in df.columns:
@@ -240,34 +266,63 @@ class DisruptionCleaner:
             df = df[df['disruption_id'].notna()]
             removed = before_count - len(df)
             if removed > 0:
-                print(f"    ⚠️  删除了 {removed} 条缺少ID的记录")
+                _log.warning("    ⚠️  删除了 %d 条缺少ID的记录", removed)
         
         # 确保impact_level在1-5范围内
         if 'impact_level' in df.columns:
             df['impact_level'] = df['impact_level'].clip(lower=1, upper=5)
         
         # 添加元数据列
-        df['is_resolved'] = 0  # 新数据默认未解决
-        df['created_at'] = datetime.now()
-        df['updated_at'] = datetime.now()
+        # 两列共用同一个时间戳（只取一次时间）；用UTC，与start_time/end_time
+        # 以及日报里的 DATE('now')（SQLite按UTC计算）保持一致
+        now_ts = pd.Timestamp.now(tz='UTC')
+        df['is_resolved'] = np.int8(0)  # 新数据默认未解决；int8只占1字节
+        df['created_at'] = now_ts
+        df['updated_at'] = now_ts
         
         # 只保留需要的列（删除API返回的原始嵌套字段）
         required_columns = [
             'disruption_id', 'type', 'title', 'description',
             'start_time', 'end_time', 'duration_minutes',
             'impact_level', 'affected_stations',
-            'is_resolved', 'created_at', 'updated_at'
+            'is_resolved', 'created_at', 'updated_at',
+            'start_jd', 'end_jd'
         ]
         
         # 保留存在的列
         existing_columns = [col for col in required_columns if col in df.columns]
         df = df[existing_columns]
         
+        # 压缩小范围整数列：impact_level(1-5)、is_resolved(0/1) 用int8，省内存和带宽
+        # duration_minutes保留float64：float32只有约7位有效数字，
+        # 写进数据库的分钟数会变（例如4415.3 → 4415.2998）
+        df = df.astype({col: 'int8' for col in ('impact_level', 'is_resolved') if col in df.columns})
+        
         return df
+    
+    def extract_station_links(self, df):
+        """
+        把affected_stations拆成 (disruption_id, station_code) 一行一个车站，
+        用于写入disruption_stations关联表（分析查询直接join，不用再在SQL里拆字符串）
+        
+        同一个disruption_id出现多次时以最后一条为准（与disruptions表的upsert一致）
+        """
+        links = (
+            df[['disruption_id', 'affected_stations']]
+            .drop_duplicates('disruption_id', keep='last')
+            .dropna()
+            .assign(station_code=lambda x: x['affected_stations'].str.split(','))
+            .explode('station_code')
+        )
+        links['station_code'] = links['station_code'].str.strip()
+        links = links[links['station_code'].notna() & links['station_code'].ne('')]
+        
+        return links[['disruption_id', 'station_code']].drop_duplicates().reset_index(drop=True)
 
 
 # ===== 测试代码 =====
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.DEBUG, format='%(message)s')
     print("=== DisruptionCleaner 测试 ===\n")
     
     # 模拟API返回的数据（简化版）
@@ -0,0 +1,8 @@
+# tests/conftest.py
+
+import sys
+from pathlib import Path
+
+# The pipeline runs as `python src/pipeline.py`, so its modules import each
+# other from src/ directly.
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / 'src'))
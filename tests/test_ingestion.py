@@ -0,0 +1,37 @@
+# tests/test_ingestion.py
+
+from unittest import mock
+
+import pytest
+from urllib3.connectionpool import HTTPConnectionPool
+from urllib3.response import HTTPResponse
+
+import ingestion.api_client as api_client
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setenv('NS_API_KEY', 'test-key')
+    # No S3 in tests: the client falls back to local-only saves
+    monkeypatch.setattr(api_client.boto3, 'client', mock.Mock(side_effect=Exception('no AWS')))
+    with api_client.NSAPIClient(max_retries=2) as c:
+        yield c
+
+
+def test_rate_limited_retry_after_is_capped(client):
+    # Every attempt is answered with 429 + a one-hour Retry-After, below the
+    # adapter, so urllib3's own retry loop runs
+    def rate_limited(*args, **kwargs):
+        return HTTPResponse(
+            body=b'', status=429, headers={'Retry-After': '3600'},
+            preload_content=False, request_method='GET',
+        )
+
+    with mock.patch.object(HTTPConnectionPool, '_make_request', side_effect=rate_limited) as request, \
+            mock.patch('urllib3.util.retry.time.sleep') as sleep:
+        assert client.fetch_disruptions() == ([], [])
+
+    # first try + max_retries, each wait clamped to the cap
+    assert request.call_count == 3
+    waits = [c.args[0] for c in sleep.call_args_list]
+    assert waits == [api_client.CappedRetry.max_retry_after] * 2
@@ -0,0 +1,188 @@
+# tests/test_pipeline.py
+
+import logging
+from unittest import mock
+
+import orjson
+import pytest
+
+from pipeline import ETLPipeline
+from storage.database import Database
+from transformation.cleaners import DisruptionCleaner
+
+# The two tables the pipeline writes, as created in the local SQLite
+# database (data/nl_rail.db); ensure_schema() adds everything newer.
+SQLITE_TABLES = """
+CREATE TABLE raw_disruptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    disruption_id TEXT NOT NULL UNIQUE,
+    raw_json TEXT NOT NULL,
+    fetched_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE disruptions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    disruption_id TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL,
+    title TEXT,
+    description TEXT,
+    start_time TIMESTAMP,
+    end_time TIMESTAMP,
+    duration_minutes INTEGER,
+    impact_level INTEGER CHECK(impact_level BETWEEN 1 AND 5),
+    affected_stations TEXT,
+    is_resolved BOOLEAN DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (disruption_id) REFERENCES raw_disruptions(disruption_id)
+);
+"""
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    # Only the load step is exercised: no API client, no run()
+    database = Database(str(tmp_path / 'test.db'))
+    database.cursor.executescript(SQLITE_TABLES)
+    database.ensure_schema()
+
+    p = ETLPipeline.__new__(ETLPipeline)
+    p.logger = logging.getLogger('test_pipeline')
+    p.database = database
+    p.cleaner = DisruptionCleaner()
+    yield p
+    database.close()
+
+
+def _record(id, type='storing', title='Storing ASD', **extra):
+    return {
+        'id': id, 'type': type, 'title': title,
+        'start': '2025-02-14T08:30:00+0100', 'end': '2025-02-14T10:00:00+0100',
+        **extra,
+    }
+
+
+def _rows(p, sql):
+    p.database.cursor.execute(sql)
+    return p.database.cursor.fetchall()
+
+
+def test_save_cleaned_data_skips_bad_record(pipeline):
+    # type is NOT NULL: the middle record can't be stored
+    df = pipeline.cleaner.clean([
+        _record('a', title='Storing ASD'),
+        _record('b', type=None, title='Storing UTR'),
+        _record('c', title='Storing RTD'),
+    ])
+
+    saved = pipeline._save_cleaned_data(df)
+
+    assert saved['disruption_id'].tolist() == ['a', 'c']
+    assert _rows(pipeline, "SELECT disruption_id, type FROM disruptions ORDER BY disruption_id") == [
+        ('a', 'disruption'), ('c', 'disruption'),
+    ]
+
+
+def test_bad_raw_record_does_not_stop_the_load(pipeline):
+    # Stands in for a raw row RDS rejects (e.g. an oversized value)
+    pipeline.database.cursor.execute("""
+        CREATE TRIGGER reject_raw BEFORE INSERT ON raw_disruptions
+        WHEN NEW.disruption_id = 'b'
+        BEGIN SELECT RAISE(ABORT, 'rejected'); END
+    """)
+    raw_data = [_record('a'), _record('b', title='Storing UTR'), _record('a')]
+    raw_records = [orjson.dumps(r) for r in raw_data]
+
+    pipeline._load(raw_data, raw_records, pipeline.cleaner.clean(raw_data))
+
+    assert _rows(pipeline, "SELECT disruption_id FROM raw_disruptions") == [('a',)]
+    assert _rows(pipeline, "SELECT disruption_id FROM disruptions ORDER BY disruption_id") == [('a',), ('b',)]
+
+
+def _links(p):
+    return _rows(p, "SELECT disruption_id, station_code FROM disruption_stations "
+                    "ORDER BY disruption_id, station_code")
+
+
+def _stations(*codes):
+    return [{'situation': {'stations': [{'stationCode': c} for c in codes]}}]
+
+
+def test_station_links_follow_shrinking_station_set(pipeline):
+    first = pipeline.cleaner.clean([
+        _record('a', timespans=_stations('ASD', 'UTR', 'RTD')),
+        _record('b', timespans=_stations('EHV')),
+    ])
+    pipeline._save_station_links(pipeline._save_cleaned_data(first))
+    assert _links(pipeline) == [('a', 'ASD'), ('a', 'RTD'), ('a', 'UTR'), ('b', 'EHV')]
+
+    # next run: 'a' now only affects ASD; 'b' is not in the batch
+    second = pipeline.cleaner.clean([_record('a', timespans=_stations('ASD'))])
+    pipeline._save_station_links(pipeline._save_cleaned_data(second))
+    assert _links(pipeline) == [('a', 'ASD'), ('b', 'EHV')]
+
+
+@pytest.fixture
+def make_pipeline(tmp_path, monkeypatch):
+    """ETLPipeline() against a SQLite file in tmp_path, with a stub API client."""
+    import pipeline as pipeline_module
+
+    monkeypatch.chdir(tmp_path)   # setup_logging() may create logs/ here
+    monkeypatch.setattr(pipeline_module, 'NSAPIClient', mock.Mock)
+    monkeypatch.setattr(pipeline_module, 'Database', lambda: Database(str(tmp_path / 'test.db')))
+    created = []
+
+    def make():
+        p = ETLPipeline()
+        created.append(p)
+        return p
+
+    yield make
+    for p in created:
+        p.close()
+
+
+def test_station_link_backfill_runs_once(tmp_path, make_pipeline):
+    # a database from before disruption_stations existed
+    database = Database(str(tmp_path / 'test.db'))
+    database.cursor.executescript(SQLITE_TABLES)
+    database.cursor.executemany(
+        "INSERT INTO disruptions (disruption_id, type, affected_stations) VALUES (?, ?, ?)",
+        [('a', 'disruption', 'ASD,UTR'), ('b', 'disruption', None)]
+    )
+    database.conn.commit()
+    database.close()
+
+    p = make_pipeline()
+    assert 'disruption_stations' in p.database.created_tables
+    assert _links(p) == [('a', 'ASD'), ('a', 'UTR')]
+
+    # links emptied behind its back: a later start doesn't rebuild them
+    p.database.cursor.execute("DELETE FROM disruption_stations")
+    p.database.conn.commit()
+    p = make_pipeline()
+    assert p.database.created_tables == set()
+    assert _links(p) == []
+
+
+def test_julian_day_backfill_only_when_columns_added(tmp_path, make_pipeline):
+    # a database from before start_jd / end_jd existed
+    database = Database(str(tmp_path / 'test.db'))
+    database.cursor.executescript(SQLITE_TABLES)
+    database.cursor.execute(
+        "INSERT INTO disruptions (disruption_id, type, start_time, end_time) "
+        "VALUES ('a', 'disruption', '2025-02-14 07:30:00', '2025-02-14 09:00:00')"
+    )
+    database.conn.commit()
+    database.close()
+
+    p = make_pipeline()
+    assert {('disruptions', 'start_jd'), ('disruptions', 'end_jd')} <= p.database.added_columns
+    assert _rows(p, "SELECT start_jd = julianday(start_time), end_jd = julianday(end_time) "
+                    "FROM disruptions") == [(1, 1)]
+
+    # later starts don't run the full-table UPDATE again
+    p.database.cursor.execute("UPDATE disruptions SET start_jd = NULL")
+    p.database.conn.commit()
+    p = make_pipeline()
+    assert p.database.added_columns == set()
+    assert _rows(p, "SELECT start_jd FROM disruptions") == [(None,)]
@@ -0,0 +1,146 @@
+# tests/test_storage.py
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.database import Database
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = Database(str(tmp_path / 'test.db'))
+    db.cursor.execute("CREATE TABLE t (a INTEGER PRIMARY KEY, b TEXT NOT NULL)")
+    db.conn.commit()
+    yield db
+    db.close()
+
+
+def _trace_inserts(db):
+    statements = []
+    db.conn.set_trace_callback(
+        lambda sql: statements.append(sql) if sql.lstrip().upper().startswith('INSERT') else None
+    )
+    return statements
+
+
+def _count(db):
+    db.cursor.execute("SELECT COUNT(*) FROM t")
+    return db.cursor.fetchone()[0]
+
+
+def test_execute_values_fills_values_marker(db):
+    statements = _trace_inserts(db)
+
+    total = db.execute_values("INSERT INTO t (a, b) VALUES {values}", [(1, 'x'), (2, 'y')], width=2)
+    db.conn.commit()
+
+    assert total == 2
+    assert len(statements) == 1
+    assert '{values}' not in statements[0]
+    assert "VALUES (1, 'x'), (2, 'y')" in statements[0]
+    db.cursor.execute("SELECT a, b FROM t ORDER BY a")
+    assert db.cursor.fetchall() == [(1, 'x'), (2, 'y')]
+
+
+@pytest.mark.parametrize('n, page_size, pages', [
+    (7, 4, 2),       # page_size * 2 - 1
+    (8, 4, 2),       # page_size * 2
+    (9, 4, 3),       # page_size * 2 + 1
+    (998, None, 2),  # SQLite default: 999 // width = 499 rows per page
+    (999, None, 3),
+])
+def test_execute_values_pages(db, n, page_size, pages):
+    statements = _trace_inserts(db)
+
+    # a generator: pages are cut with islice, never materialised up front
+    rows = ((i, str(i)) for i in range(n))
+    total = db.execute_values("INSERT INTO t (a, b) VALUES {values}", rows, width=2, page_size=page_size)
+    db.conn.commit()
+
+    assert len(statements) == pages
+    assert total == n
+    assert _count(db) == n
+
+
+def test_execute_values_sums_rowcount_across_pages(db):
+    db.execute_values("INSERT INTO t (a, b) VALUES {values}", [(i, 'old') for i in range(0, 10, 2)], width=2)
+
+    # 10 rows over 3 pages, 5 of them already present and ignored
+    total = db.execute_values(
+        "INSERT OR IGNORE INTO t (a, b) VALUES {values}",
+        [(i, 'new') for i in range(10)], width=2, page_size=4
+    )
+    db.conn.commit()
+
+    assert total == 5
+    assert _count(db) == 10
+
+
+def test_execute_values_bad_row_fails_the_page(db):
+    rows = [(1, 'x'), (2, None), (3, 'z')]
+
+    with pytest.raises(Exception):
+        db.execute_values("INSERT INTO t (a, b) VALUES {values}", rows, width=2)
+    db.conn.rollback()
+
+    assert _count(db) == 0
+
+
+def test_execute_values_on_error_skips_only_the_bad_row(db):
+    failed = []
+    rows = [(i, None if i == 5 else str(i)) for i in range(9)]
+
+    total = db.execute_values(
+        "INSERT INTO t (a, b) VALUES {values}", rows, width=2, page_size=4,
+        on_error=lambda row, e: failed.append(row)
+    )
+
+    assert failed == [(5, None)]
+    assert total == 8
+    # still the caller's transaction: nothing is committed until it says so
+    assert db.conn.in_transaction
+    db.conn.rollback()
+    assert _count(db) == 0
+
+    db.execute_values("INSERT INTO t (a, b) VALUES {values}", rows, width=2, page_size=4,
+                      on_error=lambda row, e: None)
+    db.conn.commit()
+    db.cursor.execute("SELECT a FROM t ORDER BY a")
+    assert [a for (a,) in db.cursor.fetchall()] == [0, 1, 2, 3, 4, 6, 7, 8]
+
+
+def test_execute_chunked(db):
+    db.execute_values("INSERT INTO t (a, b) VALUES {values}", [(i, str(i)) for i in range(6)], width=2)
+    statements = []
+    db.conn.set_trace_callback(statements.append)
+
+    rows = db.execute_chunked("SELECT a FROM t WHERE a IN ({placeholders})", [0, 2, 4, 5, 99], chunk_size=2)
+
+    assert sorted(rows) == [(0,), (2,), (4,), (5,)]
+    assert len(statements) == 3      # ceil(5 / 2)
+
+    assert db.execute_chunked("DELETE FROM t WHERE a IN ({placeholders})", [0, 1], chunk_size=2) == []
+    db.conn.commit()
+    assert _count(db) == 4
+
+
+def test_to_sql_rows_makes_values_bindable():
+    df = pd.DataFrame({
+        'disruption_id': ['a', 'b'],
+        'type': pd.Series(['disruption', None], dtype='category'),
+        'start_time': pd.to_datetime(['2025-02-14 07:30:00.5', None]).tz_localize('UTC'),
+        'duration_minutes': [90.0, np.nan],
+        'is_resolved': np.array([0, 1], dtype='int8'),
+    })
+
+    out = Database.to_sql_rows(df, ['disruption_id', 'type', 'start_time', 'duration_minutes',
+                                    'is_resolved', 'updated_at'])
+
+    assert list(out.itertuples(index=False, name=None)) == [
+        ('a', 'disruption', '2025-02-14 07:30:00', 90.0, False, None),
+        ('b', None, None, None, True, None),
+    ]
+    # plain Python values, not categories / numpy scalars pg8000 can't bind
+    assert type(out.iloc[0]['is_resolved']) is bool
+    assert 'updated_at' not in df.columns
@@ -0,0 +1,129 @@
+# tests/test_transformation.py
+
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from transformation.cleaners import DisruptionCleaner
+
+
+def test_clean_all_null_timespans():
+    # timespans null in every record → pandas infers a float64 column
+    df = DisruptionCleaner().clean([
+        {'id': 'a', 'type': 'storing', 'title': 'Storing ASD', 'timespans': None},
+        {'id': 'b', 'type': 'storing', 'title': 'Storing UTR'},
+    ])
+
+    assert df['disruption_id'].tolist() == ['a', 'b']
+    assert df['affected_stations'].tolist() == ['ASD', 'UTR']
+
+
+def test_clean_all_null_section():
+    df = DisruptionCleaner().clean([
+        {'id': 'a', 'type': 'verstoring', 'title': 'Storing RTD', 'section': None},
+    ])
+
+    assert df['type'].tolist() == ['disruption']
+    assert df['affected_stations'].tolist() == ['RTD']
+
+
+def test_extract_stations_from_timespans_and_section():
+    df = DisruptionCleaner().clean([
+        {
+            'id': 'a', 'type': 'storing', 'title': 'Storing XYZ',
+            'section': {'stations': [{'uicCode': '8400058'}]},
+            'timespans': [{'situation': {'stations': [{'stationCode': 'UT'}, {'stationCode': 'ASD'}]}}],
+        },
+        {'id': 'b', 'type': 'storing', 'title': 'geen codes hier'},
+    ])
+
+    # structured codes win over the title fallback; sorted and de-duplicated
+    assert df['affected_stations'].tolist() == ['8400058,ASD,UT', None]
+
+
+def _stations(n):
+    return [{'situation': {'stations': [{'stationCode': f'S{i}'} for i in range(n)]}}]
+
+
+# (type, start, end, stations) → (duration_minutes, impact_level)
+# end=None leaves the record without an end: it's ongoing and gets now + 2h
+IMPACT_CASES = {
+    'short disruption':        ('verstoring', '08:00', '08:30', 2, 30.0, 2),
+    'disruption > 1h':         ('storing', '08:00', '09:30', 0, 90.0, 3),
+    'disruption exactly 2h':   ('storing', '08:00', '10:00', 3, 120.0, 3),
+    'disruption > 2h':         ('storing', '08:00', '10:01', 1, 121.0, 4),
+    'maintenance exactly 4h':  ('werkzaamheden', '08:00', '12:00', 0, 240.0, 3),
+    'maintenance > 4h':        ('werkzaamheden', '08:00', '12:30', 5, 270.0, 4),
+    'calamity':                ('calamiteit', '08:00', '08:10', 0, 10.0, 5),
+    'cancel substring':        ('Cancellation', '08:00', '08:10', 0, 10.0, 5),
+    'unknown type':            ('other', '08:00', '12:00', 0, 240.0, 2),
+    'NaN type':                (None, '08:00', '12:00', 2, 240.0, 2),
+    'end before start':        ('storing', '10:00', '08:00', 0, None, 2),
+    'unparseable start':       ('werkzaamheden', 'garbage', '12:00', 0, None, 3),
+    'missing end_time':        ('storing', None, None, 0, 150.0, 4),
+}
+
+
+def test_impact_level_and_duration():
+    now = pd.Timestamp.now(tz='UTC')
+    records = []
+    for case, (type_, start, end, n_stations, _, _) in IMPACT_CASES.items():
+        record = {'id': case, 'type': type_, 'title': 'Storing test', 'timespans': _stations(n_stations)}
+        if start is None:
+            # ongoing: started 30 min ago, end filled in as now + 2h
+            record['start'] = (now - pd.Timedelta(minutes=30)).strftime('%Y-%m-%dT%H:%M:%S%z')
+        else:
+            record['start'] = start if start == 'garbage' else f'2025-02-14T{start}:00+0100'
+        if end is not None:
+            record['end'] = f'2025-02-14T{end}:00+0100'
+        records.append(record)
+
+    df = DisruptionCleaner().clean(records).set_index('disruption_id')
+
+    for case, (*_, duration, impact) in IMPACT_CASES.items():
+        row = df.loc[case]
+        if duration is None:
+            assert pd.isna(row['duration_minutes']), case
+        else:
+            assert row['duration_minutes'] == pytest.approx(duration, abs=1), case
+        assert row['impact_level'] == impact, case
+
+    assert df['impact_level'].dtype == 'int8'
+
+
+def test_type_normalisation():
+    df = DisruptionCleaner().clean([
+        {'id': 'a', 'type': 'verstoring', 'title': 'Storing ASD'},
+        {'id': 'b', 'type': 'STORING', 'title': 'Storing ASD'},
+        {'id': 'c', 'type': 'Werkzaamheden', 'title': 'Storing ASD'},
+        {'id': 'd', 'type': 'calamiteit', 'title': 'Storing ASD'},
+        {'id': 'e', 'type': 'onbekend', 'title': 'Storing ASD'},
+        {'id': 'f', 'type': None, 'title': 'Storing ASD'},
+    ])
+
+    assert df['type'].dtype == 'category'
+    # mapped case-insensitively; unknown types kept as-is (lowercased); missing stays null
+    assert df['type'].astype(object).where(df['type'].notna(), None).tolist() == [
+        'disruption', 'disruption', 'maintenance', 'calamity', 'onbekend', None,
+    ]
+
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'Europe/Amsterdam'])
+def test_julian_day_matches_sqlite(tz):
+    ts = pd.Series(pd.to_datetime([
+        '2025-02-14 08:30:00', '2025-07-01 23:59:59.750', '1999-12-31 00:00:01', None,
+    ], format='ISO8601'))
+    if tz is not None:
+        ts = ts.dt.tz_localize(tz)
+
+    jd = DisruptionCleaner._to_julian_day(ts)
+
+    conn = sqlite3.connect(':memory:')
+    for value, expected in zip(ts, jd):
+        if pd.isna(value):
+            assert pd.isna(expected)
+            continue
+        # what julianday() sees: the stored whole-second text; naive is UTC
+        (sqlite_jd,) = conn.execute("SELECT julianday(?)", (value.isoformat(sep=' ', timespec='seconds'),)).fetchone()
+        assert expected == sqlite_jd, value